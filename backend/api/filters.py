@@ -1,11 +1,22 @@
+from django.db.models import Exists, OuterRef
 from django_filters import rest_framework as filters
 
+from recipes.cache import get_tag_ids_by_slug
 from recipes.models import Ingredient, Recipe
+from recipes.search import search_ingredients
+from utils.constants import (
+    INGREDIENT_SEARCH_LIMIT,
+    INGREDIENT_SEARCH_MAX_LIMIT,
+)
+
+
+def tag_slug_choices():
+    return [(slug, slug) for slug in get_tag_ids_by_slug()]
 
 
 class RecipeFilter(filters.FilterSet):
-    tags = filters.AllValuesMultipleFilter(
-        field_name='tags__slug', conjoined=False
+    tags = filters.MultipleChoiceFilter(
+        choices=tag_slug_choices, method='filter_tags'
     )
     is_in_shopping_cart = filters.BooleanFilter(
         method='filter_is_in_shopping_cart'
@@ -16,6 +27,21 @@ class RecipeFilter(filters.FilterSet):
         model = Recipe
         fields = ['tags', 'author', 'is_in_shopping_cart', 'is_favorited']
 
+    def filter_tags(self, queryset, name, value):
+        """Рецепты хотя бы с одним из тегов, без JOIN и DISTINCT."""
+        tag_ids = get_tag_ids_by_slug()
+        # Тег мог быть удалён после проверки выбора.
+        ids = [tag_ids[slug] for slug in value if slug in tag_ids]
+        if not ids:
+            return queryset.none()
+        return queryset.filter(
+            Exists(
+                Recipe.tags.through.objects.filter(
+                    recipe=OuterRef('pk'), tag_id__in=ids
+                )
+            )
+        )
+
     def filter_is_in_shopping_cart(self, queryset, name, value):
         user = self.request.user
         if user.is_authenticated and value:
@@ -31,7 +57,16 @@ class RecipeFilter(filters.FilterSet):
 
 class IngredientFilter(filters.FilterSet):
     name = filters.CharFilter(lookup_expr='startswith')
+    search = filters.CharFilter(method='filter_search')
 
     class Meta:
         model = Ingredient
-        fields = ['name']
+        fields = ['name', 'search']
+
+    def filter_search(self, queryset, name, value):
+        """Top-K ингредиентов по релевантности с допуском опечаток."""
+        limit = self.data.get('limit', '')
+        limit = int(limit) if limit.isdigit() else INGREDIENT_SEARCH_LIMIT
+        return search_ingredients(
+            queryset, value, max(1, min(limit, INGREDIENT_SEARCH_MAX_LIMIT))
+        )
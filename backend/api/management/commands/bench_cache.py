@@ -0,0 +1,133 @@
+import multiprocessing
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+BACKENDS = {
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', 'bench'),
+    'file': (
+        'django.core.cache.backends.filebased.FileBasedCache',
+        '{directory}/file',
+    ),
+    'shared': ('utils.shared_cache.SharedMemoryCache', '{directory}/shared'),
+}
+
+
+def make_cache(name, directory, keys):
+    backend, location = BACKENDS[name]
+    return import_string(backend)(
+        location.format(directory=directory),
+        {'TIMEOUT': 300, 'OPTIONS': {'MAX_ENTRIES': keys * 10}},
+    )
+
+
+def per_operation(function, keys):
+    started = time.perf_counter()
+    for key in keys:
+        function(key)
+    return (time.perf_counter() - started) / len(keys) * 1e6
+
+
+def read_others(name, directory, number, options, barrier, results):
+    """Пишет свои ключи, затем читает ключи остальных процессов."""
+    cache = make_cache(name, directory, options['keys'])
+    value = 'x' * options['value_size']
+    for index in range(options['keys']):
+        cache.set(f'{number}:{index}', value)
+    barrier.wait()
+    others = [
+        f'{other}:{index}'
+        for other in range(options['processes'])
+        if other != number
+        for index in range(options['keys'])
+    ]
+    started = time.perf_counter()
+    hits = sum(cache.get(key) is not None for key in others)
+    results.put((hits, len(others), time.perf_counter() - started))
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнить кэш в общей памяти с locmem и файловым кэшем: время "
+        "операций в одном процессе и попадания между процессами"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keys', type=int, default=2000)
+        parser.add_argument('--value-size', type=int, default=200)
+        parser.add_argument('--processes', type=int, default=4)
+        parser.add_argument(
+            '--backend',
+            action='append',
+            dest='backends',
+            choices=list(BACKENDS),
+        )
+
+    def single_process(self, cache, options):
+        keys = [f'key:{index}' for index in range(options['keys'])]
+        missing = [f'missing:{index}' for index in range(options['keys'])]
+        value = 'x' * options['value_size']
+        timings = {
+            'set': per_operation(lambda key: cache.set(key, value), keys),
+            'get': per_operation(cache.get, keys),
+            'miss': per_operation(cache.get, missing),
+        }
+        counters = keys[: max(1, len(keys) // 10)]
+        for key in counters:
+            cache.set(f'counter:{key}', 0)
+        timings['incr'] = per_operation(
+            lambda key: cache.incr(f'counter:{key}'), counters * 10
+        )
+        return timings
+
+    def multi_process(self, name, directory, options):
+        context = multiprocessing.get_context('fork')
+        barrier = context.Barrier(options['processes'])
+        results = context.Queue()
+        processes = [
+            context.Process(
+                target=read_others,
+                args=(name, directory, number, options, barrier, results),
+            )
+            for number in range(options['processes'])
+        ]
+        for process in processes:
+            process.start()
+        collected = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+        hits = sum(item[0] for item in collected)
+        total = sum(item[1] for item in collected)
+        elapsed = max(item[2] for item in collected)
+        return hits / total, total / elapsed
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{'бэкенд':<8} {'set':>8} {'get':>8} {'промах':>8} "
+            f"{'incr':>8} {'попад.':>8} {'get/с':>10}"
+        )
+        for name in options['backends'] or list(BACKENDS):
+            with tempfile.TemporaryDirectory() as directory:
+                cache = make_cache(name, directory, options['keys'])
+                timings = self.single_process(cache, options)
+                cache.clear()
+                ratio, throughput = self.multi_process(
+                    name, directory, options
+                )
+            self.stdout.write(
+                f"{name:<8} "
+                + ' '.join(
+                    f"{timings[operation]:>8.1f}"
+                    for operation in ('set', 'get', 'miss', 'incr')
+                )
+                + f" {ratio:>8.0%} {throughput:>10.0f}"
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Время операций в мкс в одном процессе; попадания — доля "
+                "ключей других процессов, видимых процессу; get/с — "
+                f"суммарно в {options['processes']} процессах."
+            )
+        )
@@ -0,0 +1,97 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Выполняется в отдельном процессе, чтобы каждый замер начинался
+# с холодного интерпретатора, как у нового воркера gunicorn.
+SCRIPT = '''
+import json
+import sys
+import time
+
+started = time.perf_counter()
+from foodgram.wsgi import application  # noqa
+loaded = time.perf_counter()
+warmup = 0.0
+if sys.argv[1] == 'warm':
+    from utils.warmup import warm_up
+    warmup = warm_up()
+from django.test import Client
+from django.test.utils import setup_test_environment
+setup_test_environment()
+client = Client()
+requests = {}
+for url in sys.argv[2:]:
+    begin = time.perf_counter()
+    client.get(url)
+    requests[url] = time.perf_counter() - begin
+print(json.dumps({'load': loaded - started, 'warmup': warmup,
+                  'requests': requests}))
+'''
+
+DEFAULT_URLS = ['/api/recipes/', '/api/tags/', '/api/ingredients/?name=мук']
+
+
+class Command(BaseCommand):
+    help = (
+        "Замерить запуск воркера: импорт приложения, прогрев и первые "
+        "запросы — с прогревом и без него"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5)
+        parser.add_argument(
+            '--url',
+            action='append',
+            dest='urls',
+            help='Адрес первого запроса (можно несколько раз)',
+        )
+
+    def measure(self, mode, urls):
+        result = subprocess.run(
+            [sys.executable, '-c', SCRIPT, mode, *urls],
+            cwd=settings.BASE_DIR,
+            env=os.environ.copy(),
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode:
+            raise CommandError(result.stderr)
+        return json.loads(result.stdout.strip().splitlines()[-1])
+
+    def handle(self, *args, **options):
+        urls = options['urls'] or DEFAULT_URLS
+        for mode in ('cold', 'warm'):
+            runs = [
+                self.measure(mode, urls) for _ in range(options['runs'])
+            ]
+            self.stdout.write(self.style.MIGRATE_HEADING(mode))
+            rows = [('импорт приложения', [run['load'] for run in runs])]
+            if mode == 'warm':
+                rows.append(('прогрев', [run['warmup'] for run in runs]))
+            rows += [
+                (url, [run['requests'][url] for run in runs]) for url in urls
+            ]
+            rows.append(
+                (
+                    'до ответа на все запросы',
+                    [
+                        run['load']
+                        + run['warmup']
+                        + sum(run['requests'].values())
+                        for run in runs
+                    ],
+                )
+            )
+            for name, values in rows:
+                median = statistics.median(values) * 1000
+                maximum = max(values) * 1000
+                self.stdout.write(
+                    f"  {name:<40} медиана {median:8.1f} мс"
+                    f"  макс. {maximum:8.1f} мс"
+                )
@@ -0,0 +1,249 @@
+import json
+import random
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import RequestFactory
+
+from api.filters import IngredientFilter, RecipeFilter
+from recipes import shopping_list
+from recipes.models import (
+    FavoriteRecipe,
+    FeedEntry,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    ShoppingList,
+    Subscription,
+    Tag,
+)
+
+User = get_user_model()
+
+
+class Rollback(Exception):
+    pass
+
+
+def filter_recipes(user, **params):
+    request = RequestFactory().get('/api/recipes/', params)
+    request.user = user
+    return RecipeFilter(
+        request.GET, queryset=Recipe.objects.all(), request=request
+    ).qs
+
+
+def hot_queries(user):
+    """Каталог горячих запросов API в том виде, как их строят вьюхи."""
+    tags = list(Tag.objects.values_list('slug', flat=True)[:2])
+    prefix = (
+        Ingredient.objects.values_list('name', flat=True).first() or 'а'
+    )[:3]
+    return {
+        'recipe_list': Recipe.objects.all()[:6],
+        'recipe_list_by_author': filter_recipes(user, author=user.id)[:6],
+        'recipe_list_by_tags': filter_recipes(user, tags=tags)[:6],
+        'recipe_list_favorited': filter_recipes(user, is_favorited=1)[:6],
+        'recipe_list_in_cart': filter_recipes(user, is_in_shopping_cart=1)[
+            :6
+        ],
+        'ingredient_search': IngredientFilter(
+            {'name': prefix}, queryset=Ingredient.objects.all()
+        ).qs,
+        'shopping_cart_download': shopping_list.get_ingredients(user.id),
+        'subscriptions': User.objects.filter(
+            id__in=Subscription.objects.filter(user=user).values('author')
+        ).annotate(recipes_count=Count('recipe_author'))[:6],
+        'feed': FeedEntry.objects.filter(user=user)
+        .order_by('-recipe_id')
+        .values_list('recipe_id', flat=True)[:7],
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполнить EXPLAIN для горячих запросов API и найти '
+        'последовательные сканирования больших таблиц'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Создать N тестовых рецептов (откатываются после проверки)',
+        )
+        parser.add_argument(
+            '--min-rows',
+            type=int,
+            default=10000,
+            help='С какого размера таблица считается большой',
+        )
+        parser.add_argument('--user', help='e-mail пользователя для запросов')
+        parser.add_argument(
+            '--fail',
+            action='store_true',
+            help='Завершиться с ошибкой при найденных сканированиях',
+        )
+        parser.add_argument(
+            '--plans', action='store_true', help='Печатать планы целиком'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                if options['seed']:
+                    self.seed(options['seed'])
+                flagged = self.check_queries(options)
+                if options['seed']:
+                    raise Rollback
+        except Rollback:
+            pass
+        if flagged and options['fail']:
+            raise CommandError(
+                'Последовательные сканирования: ' + ', '.join(flagged)
+            )
+
+    def get_user(self, email):
+        users = User.objects.all()
+        if email:
+            users = users.filter(email=email)
+        user = (
+            users.annotate(carts=Count('shopping_list'))
+            .order_by('-carts')
+            .first()
+        )
+        if user is None:
+            raise CommandError('Нет пользователей для проверки запросов.')
+        return user
+
+    def check_queries(self, options):
+        large = self.large_tables(options['min_rows'])
+        flagged = []
+        queries = hot_queries(self.get_user(options['user']))
+        for name, queryset in queries.items():
+            scans = self.seq_scans(queryset) & large
+            if scans:
+                flagged.append(name)
+                self.stdout.write(
+                    self.style.ERROR(
+                        f"{name}: seq scan по {', '.join(sorted(scans))}"
+                    )
+                )
+            else:
+                self.stdout.write(self.style.SUCCESS(f'{name}: OK'))
+            if options['plans']:
+                self.stdout.write(queryset.explain())
+        return flagged
+
+    def large_tables(self, min_rows):
+        tables = set(connection.introspection.table_names())
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute(
+                    'SELECT relname FROM pg_class '
+                    "WHERE relkind = 'r' AND reltuples >= %s",
+                    [min_rows],
+                )
+                return {row[0] for row in cursor.fetchall()} & tables
+            large = set()
+            for table in tables:
+                cursor.execute(
+                    'SELECT COUNT(*) FROM '
+                    + connection.ops.quote_name(table)
+                )
+                if cursor.fetchone()[0] >= min_rows:
+                    large.add(table)
+            return large
+
+    def seq_scans(self, queryset):
+        """Таблицы, которые план читает последовательным сканированием."""
+        if connection.vendor == 'postgresql':
+            plan = json.loads(queryset.explain(format='json'))
+            nodes, tables = [plan[0]['Plan']], set()
+            while nodes:
+                node = nodes.pop()
+                if node['Node Type'] == 'Seq Scan':
+                    tables.add(node['Relation Name'])
+                nodes.extend(node.get('Plans', []))
+            return tables
+        # SQLite: строка вида "SCAN table" без использования индекса.
+        # Сканирование в порядке rowid под LIMIT без сортировки читает
+        # только начало таблицы, его не считаем.
+        plan = queryset.explain()
+        if queryset.query.is_sliced and 'TEMP B-TREE' not in plan:
+            return set()
+        tables = set()
+        for line in plan.splitlines():
+            words = line.split()
+            if 'SCAN' in words and 'USING' not in words:
+                tables.add(words[words.index('SCAN') + 1])
+        return tables
+
+    def seed(self, count):
+        """Наполнить базу синтетическими данными внутри транзакции."""
+        users = User.objects.bulk_create(
+            User(
+                email=f'seed{i}@example.com',
+                username=f'seed{i}',
+                first_name='Seed',
+                last_name=str(i),
+            )
+            for i in range(max(count // 10, 2))
+        )
+        ingredients = list(Ingredient.objects.all()) or (
+            Ingredient.objects.bulk_create(
+                Ingredient(name=f'seed {i}', measurement_unit='г')
+                for i in range(200)
+            )
+        )
+        tags = list(Tag.objects.all()) or Tag.objects.bulk_create(
+            Tag(name=f'seed {i}', slug=f'seed-{i}') for i in range(5)
+        )
+        recipes = Recipe.objects.bulk_create(
+            (
+                Recipe(
+                    author=random.choice(users),
+                    name=f'seed {i}',
+                    image='recipes/images/seed.png',
+                    text='seed',
+                    cooking_time=random.randint(1, 120),
+                )
+                for i in range(count)
+            ),
+            batch_size=1000,
+        )
+        RecipeIngredient.objects.bulk_create(
+            (
+                RecipeIngredient(
+                    recipe=recipe, ingredient=ingredient, amount=1
+                )
+                for recipe in recipes
+                for ingredient in random.sample(
+                    ingredients, min(5, len(ingredients))
+                )
+            ),
+            batch_size=1000,
+        )
+        Recipe.tags.through.objects.bulk_create(
+            (
+                Recipe.tags.through(recipe=recipe, tag=random.choice(tags))
+                for recipe in recipes
+            ),
+            batch_size=1000,
+        )
+        for model in (FavoriteRecipe, ShoppingList):
+            model.objects.bulk_create(
+                (
+                    model(user=user, recipe=recipe)
+                    for user in users
+                    for recipe in random.sample(recipes, min(10, count))
+                ),
+                batch_size=1000,
+                ignore_conflicts=True,
+            )
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
@@ -0,0 +1,178 @@
+import json
+import re
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+import requests
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import Resolver404, resolve
+from rest_framework.authtoken.models import Token
+
+from utils.traffic import synthesize
+
+User = get_user_model()
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+NUMBER = re.compile(r'/\d+(?=/|$)')
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def route(path):
+    try:
+        return resolve(path).view_name
+    except Resolver404:
+        return NUMBER.sub('/{id}', path)
+
+
+def is_raw(body):
+    return isinstance(body, dict) and isinstance(body.get('length'), int)
+
+
+class Command(BaseCommand):
+    help = (
+        "Воспроизвести трафик, записанный TrafficRecordingMiddleware, "
+        "и вывести распределение задержек по маршрутам"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument(
+            '--speedup',
+            type=float,
+            default=1.0,
+            help='Во сколько раз быстрее записи; 0 — без пауз',
+        )
+        parser.add_argument(
+            '--writes',
+            action='store_true',
+            help='Отправлять и изменяющие запросы (тело — заглушка той же '
+            'структуры)',
+        )
+        parser.add_argument(
+            '--anonymous',
+            action='store_true',
+            help='Не подставлять токены записанных пользователей',
+        )
+        parser.add_argument('--limit', type=int)
+
+    def load(self, path, options):
+        try:
+            file = open(path, encoding='utf-8')
+        except FileNotFoundError:
+            raise CommandError(f"Файл {path} не найден.")
+        records = []
+        with file:
+            for line in file:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if record['method'] in SAFE_METHODS or options['writes']:
+                    records.append(record)
+                if options['limit'] and len(records) >= options['limit']:
+                    break
+        return records
+
+    def get_tokens(self, records):
+        user_ids = {record['user'] for record in records if record['user']}
+        existing = User.objects.filter(id__in=user_ids).values_list(
+            'id', flat=True
+        )
+        return {
+            user_id: Token.objects.get_or_create(user_id=user_id)[0].key
+            for user_id in existing
+        }
+
+    def send(self, session_factory, base_url, tokens, record):
+        headers = {}
+        token = tokens.get(record['user'])
+        if token:
+            headers['Authorization'] = f'Token {token}'
+        body = record['body']
+        kwargs = {}
+        if body is not None and not is_raw(body):
+            kwargs['json'] = synthesize(body)
+        url = base_url + record['path']
+        if record['query']:
+            url += '?' + urlencode(record['query'], doseq=True)
+        started = time.perf_counter()
+        try:
+            response = session_factory().request(
+                record['method'], url, headers=headers, timeout=60, **kwargs
+            )
+            status = response.status_code
+        except requests.RequestException:
+            status = None
+        return route(record['path']), status, time.perf_counter() - started
+
+    def handle(self, *args, **options):
+        records = self.load(options['path'], options)
+        if not records:
+            raise CommandError("Нет запросов для воспроизведения.")
+        tokens = {} if options['anonymous'] else self.get_tokens(records)
+        local = threading.local()
+
+        def session_factory():
+            if not hasattr(local, 'session'):
+                local.session = requests.Session()
+            return local.session
+
+        base_url = options['base_url'].rstrip('/')
+        first = records[0]['ts']
+        speedup = options['speedup']
+        started = time.monotonic()
+        with ThreadPoolExecutor(options['concurrency']) as executor:
+            futures = []
+            for record in records:
+                if speedup:
+                    delay = (record['ts'] - first) / speedup
+                    time.sleep(max(0, started + delay - time.monotonic()))
+                futures.append(
+                    executor.submit(
+                        self.send, session_factory, base_url, tokens, record
+                    )
+                )
+            results = [future.result() for future in futures]
+        elapsed = time.monotonic() - started
+        self.report(results, elapsed)
+
+    def report(self, results, elapsed):
+        routes = defaultdict(list)
+        errors = defaultdict(int)
+        for name, status, duration in results:
+            routes[name].append(duration)
+            if status is None or status >= 500:
+                errors[name] += 1
+        self.stdout.write(
+            f"{'маршрут':<40} {'запр.':>6} {'ошиб.':>6} "
+            f"{'p50':>8} {'p90':>8} {'p99':>8} {'макс.':>8}"
+        )
+        for name in sorted(routes, key=lambda name: -len(routes[name])):
+            durations = routes[name]
+            self.stdout.write(
+                f"{name:<40} {len(durations):>6} {errors[name]:>6} "
+                + ' '.join(
+                    f"{value * 1000:>8.1f}"
+                    for value in (
+                        percentile(durations, 0.5),
+                        percentile(durations, 0.9),
+                        percentile(durations, 0.99),
+                        max(durations),
+                    )
+                )
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Запросов: {len(results)} за {elapsed:.1f} с "
+                f"({len(results) / elapsed:.1f} в секунду), время в мс"
+            )
+        )
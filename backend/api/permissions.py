@@ -1,3 +1,6 @@
+import ipaddress
+
+from django.conf import settings
 from rest_framework import permissions
 
 
@@ -14,3 +17,19 @@ class IsAuthorOrReadOnly(permissions.BasePermission):
             request.method in permissions.SAFE_METHODS
             or request.user.is_authenticated
         )
+
+
+class IsStaffOrInternalNetwork(permissions.BasePermission):
+    """Сотрудники или запросы из сетей ``METRICS_ALLOWED_NETWORKS``."""
+
+    def has_permission(self, request, view):
+        if request.user and request.user.is_staff:
+            return True
+        try:
+            address = ipaddress.ip_address(request.META.get('REMOTE_ADDR'))
+        except ValueError:
+            return False
+        return any(
+            address in ipaddress.ip_network(network)
+            for network in settings.METRICS_ALLOWED_NETWORKS
+        )
@@ -3,6 +3,7 @@ import base64
 from django.core.files.base import ContentFile
 from rest_framework import serializers
 
+from jobs.models import Job
 from recipes.models import (
     FavoriteRecipe,
     Ingredient,
@@ -13,6 +14,8 @@ from recipes.models import (
     Tag,
     User,
 )
+from recipes.signals import recipe_changed
+from utils.constants import RECIPE_BATCH_MAX_SIZE
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -69,6 +72,22 @@ class SimpleRecipeSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'image', 'cooking_time']
 
 
+class PantryRecipeSerializer(SimpleRecipeSerializer):
+    """Рецепт с числом найденных и недостающих ингредиентов."""
+
+    matched = serializers.SerializerMethodField()
+    missing = serializers.SerializerMethodField()
+
+    class Meta(SimpleRecipeSerializer.Meta):
+        fields = SimpleRecipeSerializer.Meta.fields + ['matched', 'missing']
+
+    def get_matched(self, obj):
+        return self.context['matches'][obj.id][1]
+
+    def get_missing(self, obj):
+        return self.context['matches'][obj.id][0]
+
+
 class RecipeDetailSerializer(SimpleRecipeSerializer):
     author = serializers.SerializerMethodField()
     tags = TagSerializer(many=True, read_only=True)
@@ -194,6 +213,10 @@ class RecipeSerializer(RecipeDetailSerializer):
         recipe = Recipe.objects.create(**validated_data)
         recipe.tags.set(tags_data)
         self.create_ingredients(ingredients_data, recipe)
+        # bulk_create ингредиентов не отправляет post_save.
+        recipe_changed.send(
+            sender=Recipe, recipe_ids=[recipe.pk], deleted=False
+        )
         return recipe
 
     def update(self, instance, validated_data):
@@ -208,28 +231,6 @@ class RecipeSerializer(RecipeDetailSerializer):
         return RecipeDetailSerializer(instance, context=self.context).data
 
 
-class SubscriptionSerializer(serializers.ModelSerializer):
-
-    class Meta:
-        model = Subscription
-        fields = ['user', 'author']
-
-    def validate(self, attrs):
-        author = attrs.get('author')
-        user = attrs.get('user')
-
-        if user == author:
-            raise serializers.ValidationError(
-                'Нельзя подписаться на самого себя'
-            )
-
-        if Subscription.objects.filter(user=user, author=author).exists():
-            raise serializers.ValidationError(
-                'Вы уже подписаны на этого автора'
-            )
-        return attrs
-
-
 class UserListSerializer(serializers.ModelSerializer):
     is_subscribed = serializers.SerializerMethodField()
 
@@ -265,7 +266,7 @@ class SubscriptionDetailSerializer(UserListSerializer):
     def get_recipes(self, obj):
         """Возвращает ограниченный список рецептов автора."""
         limit = self.context['request'].query_params.get('recipes_limit', None)
-        recipes = obj.recipe_author.all()
+        recipes = obj.recipe_author.filter(is_hidden=False)
         if limit and limit.isdigit():
             limit = int(limit)
             recipes = recipes[:limit]
@@ -275,43 +276,73 @@ class SubscriptionDetailSerializer(UserListSerializer):
         ).data
 
 
-class FavoriteRecipeSerializer(serializers.ModelSerializer):
-    """Сериализатор для избранного."""
+class RecipeBatchSerializer(serializers.Serializer):
+    """Сериализатор списка рецептов для пакетных операций."""
+
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=RECIPE_BATCH_MAX_SIZE,
+    )
+
+    def validate_recipes(self, value):
+        return list(dict.fromkeys(value))
+
+
+class RecipeBatchItemSerializer(serializers.ModelSerializer):
+    """Рецепт для пакетного создания.
+
+    Проверяет только сам payload; существование тегов и ингредиентов
+    проверяется сразу для всего пакета, картинка декодируется отдельно.
+    """
+
+    image = serializers.CharField()
+    tags = serializers.ListField(
+        child=serializers.IntegerField(), allow_empty=False
+    )
+    ingredients = RecipeIngredientWriteSerializer(many=True, allow_empty=False)
 
     class Meta:
-        model = FavoriteRecipe
-        fields = ['recipe', 'user']
+        model = Recipe
+        fields = [
+            'name',
+            'text',
+            'cooking_time',
+            'image',
+            'tags',
+            'ingredients',
+        ]
 
     def validate(self, attrs):
-        recipe = attrs.get('recipe')
-        user = attrs.get('user')
-        if FavoriteRecipe.objects.filter(user=user, recipe=recipe).exists():
-            raise serializers.ValidationError('Рецепт уже в избранном')
+        ingredients_ids = [item['id'] for item in attrs['ingredients']]
+        if len(ingredients_ids) != len(set(ingredients_ids)):
+            raise serializers.ValidationError(
+                'Ингредиенты должны быть уникальными'
+            )
+        if len(attrs['tags']) != len(set(attrs['tags'])):
+            raise serializers.ValidationError('Теги должны быть уникальными')
         return attrs
 
-    def to_representation(self, instance):
-        return SimpleRecipeSerializer(
-            instance.recipe, context=self.context
-        ).data
 
+class RecipeCreateBatchSerializer(serializers.Serializer):
+    recipes = serializers.ListField(
+        child=serializers.DictField(),
+        allow_empty=False,
+        max_length=RECIPE_BATCH_MAX_SIZE,
+    )
 
-class ShoppingListSerializer(serializers.ModelSerializer):
-    """Сериализатор для корзины покупок."""
 
-    class Meta:
-        model = ShoppingList
-        fields = ['recipe', 'user']
-
-        def validate(self, attrs):
-            recipe = attrs.get('recipe')
-            user = attrs.get('user')
-            if ShoppingList.objects.filter(user=user, recipe=recipe).exists():
-                return serializers.ValidationError(
-                    'Рецепт уже в списке покупок'
-                )
-            return attrs
+class JobSerializer(serializers.ModelSerializer):
+    """Состояние фоновой задачи; результат — после завершения."""
 
-    def to_representation(self, instance):
-        return SimpleRecipeSerializer(
-            instance.recipe, context=self.context
-        ).data
+    class Meta:
+        model = Job
+        fields = [
+            'id',
+            'name',
+            'status',
+            'attempts',
+            'result',
+            'created_at',
+            'updated_at',
+        ]
@@ -0,0 +1,120 @@
+import time
+
+from django.core.cache import cache
+from django.db import connections
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from recipes.models import Recipe
+from recipes.snapshots import build_snapshots
+from user.models import User
+from utils.db_router import PIN_COOKIE, _use_replica
+
+
+class ReplicaRoutingTests(TransactionTestCase):
+    databases = {'default', 'replica_1'}
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='user@example.com',
+            username='user',
+            password='password',
+            first_name='Имя',
+            last_name='Фамилия',
+        )
+        author = User.objects.create_user(
+            email='author@example.com',
+            username='author',
+            password='password',
+            first_name='Имя',
+            last_name='Фамилия',
+        )
+        self.recipe = Recipe.objects.create(
+            author=author,
+            name='Рецепт',
+            text='Описание',
+            cooking_time=5,
+            image='recipes/images/recipe.png',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_recipes(self):
+        """Список рецептов и число запросов к основной базе и к реплике."""
+        with CaptureQueriesContext(
+            connections['default']
+        ) as primary, CaptureQueriesContext(
+            connections['replica_1']
+        ) as replica:
+            response = self.client.get('/api/recipes/')
+        self.assertEqual(response.status_code, 200)
+        return len(primary), len(replica)
+
+    def write(self):
+        response = self.client.post(
+            f'/api/recipes/{self.recipe.id}/favorite/'
+        )
+        self.assertEqual(response.status_code, 201)
+        # Проверяется привязка на сервере, а не cookie браузера.
+        self.client.cookies.pop(PIN_COOKIE)
+
+    def test_safe_reads_use_replica(self):
+        primary, replica = self.get_recipes()
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+
+    def test_anonymous_reads_use_replica(self):
+        self.client.force_authenticate(None)
+        primary, replica = self.get_recipes()
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+
+    def test_user_pinned_to_primary_after_write(self):
+        self.write()
+        primary, replica = self.get_recipes()
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
+
+    def test_pin_is_per_user(self):
+        self.write()
+        other = User.objects.create_user(
+            email='other@example.com',
+            username='other',
+            password='password',
+            first_name='Имя',
+            last_name='Фамилия',
+        )
+        self.client.force_authenticate(other)
+        primary, replica = self.get_recipes()
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+
+    @override_settings(REPLICA_PIN_SECONDS=1)
+    def test_pin_expires_after_replica_pin_seconds(self):
+        self.write()
+        self.assertEqual(self.get_recipes()[1], 0)
+        time.sleep(1.1)
+        primary, replica = self.get_recipes()
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+
+    @override_settings(REPLICA_PIN_SECONDS=7)
+    def test_pin_cookie_lives_replica_pin_seconds(self):
+        response = self.client.post(
+            f'/api/recipes/{self.recipe.id}/favorite/'
+        )
+        self.assertEqual(response.cookies[PIN_COOKIE]['max-age'], 7)
+
+    def test_snapshots_built_from_primary(self):
+        token = _use_replica.set(True)
+        try:
+            with CaptureQueriesContext(
+                connections['replica_1']
+            ) as replica:
+                snapshots = build_snapshots([self.recipe.id])
+        finally:
+            _use_replica.reset(token)
+        self.assertEqual(len(replica), 0)
+        self.assertEqual(snapshots[self.recipe.id]['name'], 'Рецепт')
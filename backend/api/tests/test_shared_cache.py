@@ -0,0 +1,129 @@
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+
+from django.test import SimpleTestCase
+
+from utils.shared_cache import SharedMemoryCache
+
+PROCESSES = 4
+INCREMENTS = 2000
+WRITE_SECONDS = 1
+# Время на запуск процесса-писателя.
+START_SECONDS = 30
+
+
+def make_cache(location, **options):
+    return SharedMemoryCache(location, {'OPTIONS': options})
+
+
+def increment(location, times):
+    cache = make_cache(location)
+    for _ in range(times):
+        cache.incr('counter')
+
+
+def write_values(location, stop):
+    """Пишет значения разной длины, пока не выставлен ``stop``."""
+    cache = make_cache(location)
+    number = 0
+    while not stop.is_set():
+        number += 1
+        cache.set('value', (number, 'x' * (number % 300), number))
+
+
+class SharedMemoryCacheTests(SimpleTestCase):
+    def setUp(self):
+        handle, self.location = tempfile.mkstemp(prefix='foodgram-cache-')
+        os.close(handle)
+        os.unlink(self.location)
+        self.addCleanup(self.remove_file)
+        self.cache = make_cache(self.location)
+        self.context = multiprocessing.get_context('spawn')
+
+    def remove_file(self):
+        if os.path.exists(self.location):
+            os.unlink(self.location)
+
+    def test_incr_from_processes(self):
+        self.cache.set('counter', 0)
+        processes = [
+            self.context.Process(
+                target=increment, args=(self.location, INCREMENTS)
+            )
+            for _ in range(PROCESSES)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+            self.assertEqual(process.exitcode, 0)
+        self.assertEqual(self.cache.get('counter'), PROCESSES * INCREMENTS)
+
+    def test_concurrent_set_and_get(self):
+        """Читатель не видит значение, записанное наполовину."""
+        stop = self.context.Event()
+        writer = self.context.Process(
+            target=write_values, args=(self.location, stop)
+        )
+        writer.start()
+        self.addCleanup(writer.join)
+        self.addCleanup(stop.set)
+        deadline = time.monotonic() + START_SECONDS
+        while self.cache.get('value') is None:
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.01)
+        torn = []
+        reads = []
+
+        def read():
+            count = 0
+            deadline = time.monotonic() + WRITE_SECONDS
+            while time.monotonic() < deadline:
+                try:
+                    value = self.cache.get('value')
+                except Exception as error:
+                    torn.append(error)
+                    continue
+                if value is None:
+                    continue
+                count += 1
+                number, padding, check = value
+                if check != number or len(padding) != number % 300:
+                    torn.append(value)
+            reads.append(count)
+
+        readers = [threading.Thread(target=read) for _ in range(2)]
+        for reader in readers:
+            reader.start()
+        for reader in readers:
+            reader.join()
+        self.assertEqual(torn, [])
+        self.assertEqual(len(reads), len(readers))
+        self.assertTrue(all(reads))
+
+    def test_least_recently_read_is_evicted(self):
+        cache = make_cache(
+            self.location, MAX_SIZE=1, SLOT_SIZES=[256], WAYS=2
+        )
+        cache.set('first', 1)
+        cache.set('second', 2)
+        self.assertEqual(cache.get('first'), 1)
+        cache.set('third', 3)
+        self.assertIsNone(cache.get('second'))
+        self.assertEqual(cache.get('first'), 1)
+        self.assertEqual(cache.get('third'), 3)
+
+    def test_value_moves_between_size_classes(self):
+        small, large = 'x', 'x' * 1000
+        self.cache.set('key', small)
+        self.cache.set('key', large)
+        self.assertEqual(self.cache.get('key'), large)
+        self.cache.set('key', small)
+        self.assertEqual(self.cache.get('key'), small)
+        self.assertFalse(self.cache.add('key', large))
+        self.assertTrue(self.cache.delete('key'))
+        self.assertIsNone(self.cache.get('key'))
+        self.assertFalse(self.cache.delete('key'))
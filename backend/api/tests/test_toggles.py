@@ -0,0 +1,74 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connections
+from django.test import TransactionTestCase
+from rest_framework.test import APIClient
+
+from recipes.models import FavoriteRecipe, Recipe, ShoppingList, Subscription
+from user.models import User
+
+PARALLEL_REQUESTS = 8
+
+
+class ParallelToggleTests(TransactionTestCase):
+    """Одновременные одинаковые запросы создают одну строку."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='user@example.com',
+            username='user',
+            password='password',
+            first_name='Имя',
+            last_name='Фамилия',
+        )
+        self.author = User.objects.create_user(
+            email='author@example.com',
+            username='author',
+            password='password',
+            first_name='Имя',
+            last_name='Фамилия',
+        )
+        self.recipe = Recipe.objects.create(
+            author=self.author,
+            name='Рецепт',
+            text='Описание',
+            cooking_time=5,
+            image='recipes/images/recipe.png',
+        )
+
+    def post_in_parallel(self, url):
+        """Коды ответов на ``PARALLEL_REQUESTS`` одновременных POST."""
+        barrier = threading.Barrier(PARALLEL_REQUESTS)
+
+        def post(_):
+            client = APIClient()
+            client.force_authenticate(self.user)
+            barrier.wait()
+            try:
+                return client.post(url).status_code
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(PARALLEL_REQUESTS) as executor:
+            return sorted(executor.map(post, range(PARALLEL_REQUESTS)))
+
+    def assert_single_row(self, url, model):
+        codes = self.post_in_parallel(url)
+        self.assertEqual(codes, [201] + [400] * (PARALLEL_REQUESTS - 1))
+        self.assertEqual(model.objects.filter(user=self.user).count(), 1)
+
+    def test_favorite(self):
+        self.assert_single_row(
+            f'/api/recipes/{self.recipe.id}/favorite/', FavoriteRecipe
+        )
+
+    def test_shopping_cart(self):
+        self.assert_single_row(
+            f'/api/recipes/{self.recipe.id}/shopping_cart/', ShoppingList
+        )
+
+    def test_subscribe(self):
+        self.assert_single_row(
+            f'/api/users/{self.author.id}/subscribe/', Subscription
+        )
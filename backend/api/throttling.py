@@ -0,0 +1,90 @@
+"""Ограничение частоты запросов к дорогим эндпоинтам (token bucket).
+
+Ставка ``'N/период'`` из ``DEFAULT_THROTTLE_RATES`` означает корзину на N
+токенов, которая пополняется N токенами за период: короткий всплеск до N
+запросов проходит, дальше — не чаще ставки. Состояние корзин хранится в
+кэше Django, внешний сервис не нужен. Обновление корзины не атомарно,
+поэтому при гонке параллельных запросов лимит соблюдается приближённо.
+"""
+import time
+
+from django.core.cache import cache
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+from utils import metrics
+
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 60 * 60 * 24}
+REJECTS_KEY = 'throttle:rejects:{}'
+
+
+def parse_rate(rate):
+    count, period = rate.split('/')
+    return int(count), PERIODS[period[0]]
+
+
+def record_rejection(scope):
+    metrics.inc('foodgram_throttle_rejections_total', scope=scope)
+    key = REJECTS_KEY.format(scope)
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def get_rejection_counts():
+    """Число отказов по каждой настроенной области."""
+    scopes = api_settings.DEFAULT_THROTTLE_RATES
+    counts = cache.get_many([REJECTS_KEY.format(scope) for scope in scopes])
+    return {
+        scope: counts.get(REJECTS_KEY.format(scope), 0) for scope in scopes
+    }
+
+
+class ScopedTokenBucketThrottle(BaseThrottle):
+    """Корзина на пользователя (для анонимов — на IP) для ``throttle_scope``.
+
+    Область берётся из атрибута вьюхи; если для неё не задана ставка,
+    запросы не ограничиваются.
+    """
+
+    scope_suffix = ''
+
+    def get_scope(self, view):
+        scope = getattr(view, 'throttle_scope', None)
+        return scope and scope + self.scope_suffix
+
+    def get_ident_key(self, request):
+        if request.user and request.user.is_authenticated:
+            return f'user:{request.user.pk}'
+        return f'ip:{self.get_ident(request)}'
+
+    def allow_request(self, request, view):
+        scope = self.get_scope(view)
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(scope)
+        if rate is None:
+            return True
+        capacity, period = parse_rate(rate)
+        key = f'throttle:{scope}:{self.get_ident_key(request)}'
+        now = time.time()
+        tokens, updated = cache.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated) * capacity / period)
+        if tokens >= 1:
+            cache.set(key, (tokens - 1, now), period)
+            return True
+        self.wait_time = (1 - tokens) * period / capacity
+        record_rejection(scope)
+        return False
+
+    def wait(self):
+        return self.wait_time
+
+
+class ScopedIPTokenBucketThrottle(ScopedTokenBucketThrottle):
+    """Корзина на IP-адрес для области ``<throttle_scope>_ip``."""
+
+    scope_suffix = '_ip'
+
+    def get_ident_key(self, request):
+        return f'ip:{self.get_ident(request)}'
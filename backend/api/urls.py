@@ -4,14 +4,19 @@ from rest_framework.routers import DefaultRouter
 from api.views import (
     CustomUserViewSet,
     DownloadShoppingCartView,
+    FavoriteRecipeBatchView,
     FavoriteRecipeView,
     IngredientViewSet,
+    JobView,
+    RecipeCreateBatchView,
     RecipeViewSet,
+    ShoppingCartBatchView,
     ShoppingCartView,
     ShortLinkView,
     SubscribeView,
     SubscriptionListView,
     TagViewSet,
+    ThrottleStatsView,
 )
 
 router = DefaultRouter()
@@ -34,6 +39,21 @@ urlpatterns = [
         DownloadShoppingCartView.as_view(),
         name='download_shopping_cart',
     ),
+    path(
+        'recipes/batch/',
+        RecipeCreateBatchView.as_view(),
+        name='recipe_create_batch',
+    ),
+    path(
+        'recipes/favorite/batch/',
+        FavoriteRecipeBatchView.as_view(),
+        name='favorite_recipe_batch',
+    ),
+    path(
+        'recipes/shopping_cart/batch/',
+        ShoppingCartBatchView.as_view(),
+        name='shopping_cart_batch',
+    ),
     path(
         'recipes/<int:id>/favorite/',
         FavoriteRecipeView.as_view(),
@@ -49,6 +69,8 @@ urlpatterns = [
         ShortLinkView.as_view(),
         name='get_short_link',
     ),
+    path('throttles/', ThrottleStatsView.as_view(), name='throttle_stats'),
+    path('jobs/<int:pk>/', JobView.as_view(), name='job'),
     path('auth/', include('djoser.urls.authtoken')),
     path('', include(router.urls)),
 ]
@@ -1,48 +1,102 @@
+import binascii
 import hashlib
+import re
+from concurrent.futures import ThreadPoolExecutor
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db.models import Count, Sum
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.files.storage import default_storage
+from django.db import router, transaction
+from django.db.models import Count, Exists, OuterRef, Q
 from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
-from rest_framework import status
+from rest_framework import generics, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import (
     AllowAny,
+    IsAdminUser,
     IsAuthenticated,
     IsAuthenticatedOrReadOnly,
 )
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
 
 from api.filters import IngredientFilter, RecipeFilter
-from api.permissions import IsAuthorOrReadOnly
+from api.permissions import IsAuthorOrReadOnly, IsStaffOrInternalNetwork
 from api.serializers import (
     AvatarSerializer,
-    FavoriteRecipeSerializer,
+    Base64ImageField,
     IngredientSerializer,
+    JobSerializer,
+    PantryRecipeSerializer,
+    RecipeBatchItemSerializer,
+    RecipeBatchSerializer,
+    RecipeCreateBatchSerializer,
     RecipeDetailSerializer,
     RecipeSerializer,
-    ShoppingListSerializer,
+    SimpleRecipeSerializer,
     SubscriptionDetailSerializer,
-    SubscriptionSerializer,
     TagSerializer,
 )
+from api.throttling import (
+    ScopedIPTokenBucketThrottle,
+    ScopedTokenBucketThrottle,
+    get_rejection_counts,
+)
+from jobs import queue
+from jobs.models import Job
+from recipes import feed, pantry, shopping_list
+from recipes.cache import get_reference_body
+from recipes.feed import get_feed_recipe_ids
 from recipes.models import (
     FavoriteRecipe,
     Ingredient,
     Recipe,
     RecipeIngredient,
     ShoppingList,
+    SimilarRecipe,
     Subscription,
     Tag,
 )
-from utils.pagination import CustomPageNumberPagination
+from recipes.signals import recipe_changed
+from recipes.snapshots import FIELDS as RECIPE_FIELDS
+from recipes.snapshots import render_recipes
+from recipes.tasks import export_shopping_list
+from utils import metrics
+from utils.constants import (
+    RECIPE_BATCH_IMAGE_WORKERS,
+    REFERENCE_IMMUTABLE_MAX_AGE,
+    REFERENCE_VERSION_PARAM,
+    SHOPPING_LIST_ASYNC_MIN_RECIPES,
+    SIMILAR_RECIPES_LIMIT,
+)
+from utils.db_router import ReplicaReadMixin
+from utils.pagination import (
+    CustomPageNumberPagination,
+    EstimatedCountPagination,
+    IdCursorPagination,
+)
 
 User = get_user_model()
 
+ACCEPTS_GZIP = re.compile(r'\bgzip\b')
+
+VISIBLE_RECIPES_COUNT = Count(
+    'recipe_author', filter=Q(recipe_author__is_hidden=False)
+)
+
 
 class ShortLinkView(APIView):
     permission_classes = [IsAuthenticatedOrReadOnly]
@@ -54,55 +108,288 @@ class ShortLinkView(APIView):
         return Response({'short-link': short}, status=status.HTTP_200_OK)
 
 
-class RecipeViewSet(ModelViewSet):
-    queryset = Recipe.objects.select_related('author').prefetch_related(
-        'tags', 'recipe_ingredients__ingredient'
+class RecipeViewSet(ReplicaReadMixin, ModelViewSet):
+    queryset = (
+        Recipe.objects.visible()
+        .select_related('author')
+        .prefetch_related('tags', 'recipe_ingredients__ingredient')
     )
     permission_classes = [IsAuthorOrReadOnly]
-    pagination_class = CustomPageNumberPagination
+    pagination_class = EstimatedCountPagination
     filter_backends = [DjangoFilterBackend]
     filterset_class = RecipeFilter
+    throttle_classes = [ScopedTokenBucketThrottle, ScopedIPTokenBucketThrottle]
+    throttle_scope = 'recipe_write'
 
     def get_serializer_class(self):
         if self.action == 'retrieve':
             return RecipeDetailSerializer
         return RecipeSerializer
 
+    def get_throttles(self):
+        if self.action in ('create', 'update', 'partial_update'):
+            return super().get_throttles()
+        return []
+
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
+    def get_id_queryset(self):
+        return (
+            self.get_queryset()
+            .select_related(None)
+            .prefetch_related(None)
+            .values_list('id', flat=True)
+        )
+
+    def get_fields(self):
+        """Поля ответа по параметрам ``fields`` и ``omit`` (через запятую)."""
+        requested = {}
+        for param in ('fields', 'omit'):
+            names = {
+                name.strip()
+                for value in self.request.query_params.getlist(param)
+                for name in value.split(',')
+                if name.strip()
+            }
+            unknown = names.difference(RECIPE_FIELDS)
+            if unknown:
+                raise ValidationError(
+                    {
+                        param: 'Неизвестные поля: '
+                        + ', '.join(sorted(unknown))
+                        + '. Допустимые: '
+                        + ', '.join(RECIPE_FIELDS)
+                    }
+                )
+            requested[param] = names
+        return [
+            field
+            for field in RECIPE_FIELDS
+            if (not requested['fields'] or field in requested['fields'])
+            and field not in requested['omit']
+        ]
+
+    def render(self, recipe_ids):
+        return render_recipes(recipe_ids, self.request, self.get_fields())
+
+    def list(self, request, *args, **kwargs):
+        recipe_ids = self.paginate_queryset(
+            self.filter_queryset(self.get_id_queryset())
+        )
+        return self.get_paginated_response(self.render(recipe_ids))
+
+    def retrieve(self, request, *args, **kwargs):
+        recipe_id = generics.get_object_or_404(
+            self.get_id_queryset(), pk=kwargs['pk']
+        )
+        return Response(self.render([recipe_id])[0])
+
+    @action(
+        detail=False, methods=['get'], permission_classes=[IsAuthenticated]
+    )
+    def feed(self, request):
+        """Свежие рецепты авторов, на которых подписан пользователь."""
+        paginator = IdCursorPagination()
+        recipe_ids = paginator.paginate_ids(
+            request,
+            lambda before, limit: get_feed_recipe_ids(
+                request.user, before, limit
+            ),
+        )
+        visible = set(self.get_id_queryset().filter(id__in=recipe_ids))
+        return paginator.get_paginated_response(
+            self.render([pk for pk in recipe_ids if pk in visible])
+        )
+
+    @action(detail=False, methods=['get'])
+    def trending(self, request):
+        """Популярные рецепты в окне ``window``, совместимо с фильтрами."""
+        window = request.query_params.get(
+            'window', settings.TRENDING_DEFAULT_WINDOW
+        )
+        if window not in settings.TRENDING_HALF_LIVES:
+            raise ValidationError(
+                {
+                    'window': 'Допустимые окна: '
+                    + ', '.join(settings.TRENDING_HALF_LIVES)
+                }
+            )
+        queryset = (
+            self.filter_queryset(self.get_id_queryset())
+            .filter(trending_scores__window=window)
+            .order_by('-trending_scores__score', '-id')
+        )
+        return self.get_paginated_response(
+            self.render(self.paginate_queryset(queryset))
+        )
+
+    @action(detail=False, methods=['get'])
+    def pantry(self, request):
+        """Рецепты по продуктам ``ingredients``: меньше недостающих — выше."""
+        values = ','.join(request.query_params.getlist('ingredients'))
+        try:
+            ingredient_ids = {int(pk) for pk in values.split(',') if pk}
+        except ValueError:
+            raise ValidationError({'ingredients': 'Ожидаются id ингредиентов'})
+        if not ingredient_ids:
+            raise ValidationError({'ingredients': 'Укажите ингредиенты'})
+        page = self.paginate_queryset(
+            pantry.get_index().match(ingredient_ids)
+        )
+        recipe_ids = [recipe_id for recipe_id, *_ in page]
+        recipes = (
+            self.get_queryset()
+            .select_related(None)
+            .prefetch_related(None)
+            .only(*SimpleRecipeSerializer.Meta.fields)
+            .in_bulk(recipe_ids)
+        )
+        serializer = PantryRecipeSerializer(
+            [recipes[pk] for pk in recipe_ids if pk in recipes],
+            many=True,
+            context={
+                **self.get_serializer_context(),
+                'matches': {
+                    recipe_id: (missing, matched)
+                    for recipe_id, missing, matched in page
+                },
+            },
+        )
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk=None):
+        """Рецепты с наибольшим пересечением ингредиентов и тегов."""
+        recipe_id = generics.get_object_or_404(self.get_id_queryset(), pk=pk)
+        similar = (
+            SimilarRecipe.objects.filter(
+                recipe_id=recipe_id,
+                similar__is_hidden=False,
+                similar__author__is_active=True,
+            )
+            .select_related('similar')
+            .only(
+                'similar',
+                *(
+                    f'similar__{field}'
+                    for field in SimpleRecipeSerializer.Meta.fields
+                ),
+            )
+            .order_by('-score')[:SIMILAR_RECIPES_LIMIT]
+        )
+        serializer = SimpleRecipeSerializer(
+            [item.similar for item in similar],
+            many=True,
+            context=self.get_serializer_context(),
+        )
+        return Response(serializer.data)
+
+
+class ReferenceListMixin:
+    """Полный список справочника из памяти процесса с HTTP-кэшированием.
 
-class TagViewSet(ReadOnlyModelViewSet):
+    Тело и его gzip-вариант перестраиваются только при смене версии
+    набора ``reference_name``. ETag — хеш содержимого: без параметров
+    клиент перепроверяет список через If-None-Match и получает 304, а
+    URL с ``?v=<ETag без кавычек>`` неизменяем и кэшируется на год.
+    Запросы с фильтрами обрабатываются как обычно.
+    """
+
+    reference_name = None
+
+    def render_reference(self):
+        queryset = self.get_queryset()
+        # Из основной БД: реплика могла ещё не получить изменение,
+        # вместе с которым сменилась версия.
+        queryset = queryset.using(router.db_for_write(queryset.model))
+        return JSONRenderer().render(
+            self.get_serializer(queryset, many=True).data
+        )
+
+    def list(self, request, *args, **kwargs):
+        if (
+            set(request.query_params) - {REFERENCE_VERSION_PARAM}
+            or request.accepted_renderer.format != 'json'
+        ):
+            return super().list(request, *args, **kwargs)
+        body = get_reference_body(self.reference_name, self.render_reference)
+        accept_encoding = request.META.get('HTTP_ACCEPT_ENCODING', '')
+        encoding = 'identity'
+        if ACCEPTS_GZIP.search(accept_encoding):
+            encoding = 'gzip'
+        response = HttpResponse(
+            body.encodings[encoding], content_type='application/json'
+        )
+        # Сжатый и несжатый ответы — разные представления, и strong ETag
+        # у них должен различаться.
+        if encoding == 'identity':
+            etag = f'"{body.tag}"'
+        else:
+            response['Content-Encoding'] = encoding
+            etag = f'"{body.tag}-{encoding}"'
+        response['ETag'] = etag
+        patch_vary_headers(response, ['Accept-Encoding'])
+        if request.query_params.get(REFERENCE_VERSION_PARAM) == body.tag:
+            patch_cache_control(
+                response,
+                public=True,
+                max_age=REFERENCE_IMMUTABLE_MAX_AGE,
+                immutable=True,
+            )
+        else:
+            patch_cache_control(response, public=True, no_cache=True)
+        return get_conditional_response(
+            request, etag=etag, response=response
+        )
+
+
+class TagViewSet(ReferenceListMixin, ReplicaReadMixin, ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = [AllowAny]
     pagination_class = None
+    reference_name = 'tags'
 
 
-class IngredientViewSet(ReadOnlyModelViewSet):
+class IngredientViewSet(
+    ReferenceListMixin, ReplicaReadMixin, ReadOnlyModelViewSet
+):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = [AllowAny]
     pagination_class = None
     filter_backends = [DjangoFilterBackend]
     filterset_class = IngredientFilter
+    throttle_classes = [ScopedTokenBucketThrottle, ScopedIPTokenBucketThrottle]
+    throttle_scope = 'ingredients'
+    reference_name = 'ingredients'
 
 
 class SubscribeView(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request, id):
-        queryset = User.objects.annotate(
-            recipes_count=Count('recipe_author')
-        ).all()
-        author = get_object_or_404(queryset, id=id)
-        data = {'author': author.id, 'user': request.user.id}
-        serializer = SubscriptionSerializer(
-            data=data, context={'request': request}
+        if not Subscription.objects.add(request.user.id, id):
+            if not User.objects.filter(id=id, is_active=True).exists():
+                return Response(
+                    {'error': 'Автор не найден'},
+                    status=status.HTTP_404_NOT_FOUND,
+                )
+            if id == request.user.id:
+                error = 'Нельзя подписаться на самого себя'
+            else:
+                error = 'Вы уже подписаны на этого автора'
+            return Response(
+                {'error': error}, status=status.HTTP_400_BAD_REQUEST
+            )
+        # Вставка в обход ORM не отправляет post_save.
+        feed.backfill_feed(request.user.id, id)
+        author = (
+            User.objects.filter(id=id)
+            .annotate(recipes_count=VISIBLE_RECIPES_COUNT)
+            .get()
         )
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
-
         serializer = SubscriptionDetailSerializer(
             author,
             context={
@@ -113,23 +400,18 @@ class SubscribeView(APIView):
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     def delete(self, request, id):
+        if Subscription.objects.remove(request.user.id, id):
+            feed.drop_author(request.user.id, id)
+            return Response(status=status.HTTP_204_NO_CONTENT)
         if not User.objects.filter(id=id).exists():
             return Response(
                 {'error': 'Автор не найден'},
                 status=status.HTTP_404_NOT_FOUND,
             )
-
-        deleted_count, _ = Subscription.objects.filter(
-            user=request.user, author_id=id
-        ).delete()
-
-        if deleted_count == 0:
-            return Response(
-                {'error': 'Вы не подписаны на этого автора'},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-
-        return Response(status=status.HTTP_204_NO_CONTENT)
+        return Response(
+            {'error': 'Вы не подписаны на этого автора'},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
 
 
 class SubscriptionListView(ModelViewSet):
@@ -141,9 +423,9 @@ class SubscriptionListView(ModelViewSet):
     def list(self, request, *args, **kwargs):
         user = request.user
         subscriptions = Subscription.objects.filter(user=user).values('author')
-        authors = self.queryset.filter(id__in=subscriptions).annotate(
-            recipes_count=Count('recipe_author')
-        )
+        authors = self.queryset.filter(
+            id__in=subscriptions, is_active=True
+        ).annotate(recipes_count=VISIBLE_RECIPES_COUNT)
 
         serializer = SubscriptionDetailSerializer(
             self.paginate_queryset(authors),
@@ -154,101 +436,345 @@ class SubscriptionListView(ModelViewSet):
         return self.get_paginated_response(serializer.data)
 
 
-class FavoriteRecipeView(APIView):
+class RecipeRelationView(APIView):
+    """Добавление рецепта в избранное или корзину и удаление из них.
+
+    Запись — один идемпотентный запрос; что именно помешало, выясняется
+    только при неудаче.
+    """
+
     permission_classes = [IsAuthenticated]
+    model = None
+    exists_error = None
+    missing_error = None
 
     def post(self, request, id):
-        recipe = get_object_or_404(Recipe, id=id)
-        data = {'recipe': recipe.id, 'user': request.user.id}
-        serializer = FavoriteRecipeSerializer(
-            data=data, context={'request': request}
+        if not self.model.objects.add(request.user.id, id):
+            if not Recipe.objects.visible().filter(id=id).exists():
+                return Response(
+                    {'error': 'Рецепт не найден'},
+                    status=status.HTTP_404_NOT_FOUND,
+                )
+            return Response(
+                {'error': self.exists_error},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        serializer = SimpleRecipeSerializer(
+            Recipe.objects.get(id=id), context={'request': request}
         )
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     def delete(self, request, id):
+        if self.model.objects.remove(request.user.id, id):
+            return Response(status=status.HTTP_204_NO_CONTENT)
         if not Recipe.objects.filter(id=id).exists():
             return Response(
                 {'error': 'Рецепт не найден'},
                 status=status.HTTP_404_NOT_FOUND,
             )
-
-        deleted, _ = FavoriteRecipe.objects.filter(
-            user=request.user, recipe_id=id
-        ).delete()
-        if deleted:
-            return Response(status=status.HTTP_204_NO_CONTENT)
         return Response(
-            {'error': 'Рецепт отсутствует в избранном'},
+            {'error': self.missing_error},
             status=status.HTTP_400_BAD_REQUEST,
         )
 
 
-class ShoppingCartView(APIView):
+class FavoriteRecipeView(RecipeRelationView):
+    model = FavoriteRecipe
+    exists_error = 'Рецепт уже в избранном'
+    missing_error = 'Рецепт отсутствует в избранном'
+
+
+class ShoppingCartView(RecipeRelationView):
+    model = ShoppingList
+    exists_error = 'Рецепт уже в списке покупок'
+    missing_error = 'Рецепт отсутствует в списке покупок'
+
+
+class RecipeRelationBatchView(APIView):
+    """Пакетное добавление и удаление рецептов в избранное или корзину."""
+
     permission_classes = [IsAuthenticated]
+    model = None
 
-    def post(self, request, id):
-        recipe = get_object_or_404(Recipe, id=id)
-        data = {'recipe': recipe.id, 'user': request.user.id}
-        serializer = ShoppingListSerializer(
-            data=data, context={'request': request}
-        )
+    def get_recipe_ids(self, request):
+        serializer = RecipeBatchSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        serializer.save()
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
-
-    def delete(self, request, id):
-        if not Recipe.objects.filter(id=id).exists():
-            return Response(
-                {'error': 'Рецепт не найден'},
-                status=status.HTTP_404_NOT_FOUND,
+        return serializer.validated_data['recipes']
+
+    def get_states(self, user, recipe_ids):
+        """Одним запросом находит рецепты и уже существующие связи."""
+        return dict(
+            Recipe.objects.visible()
+            .filter(id__in=recipe_ids)
+            .annotate(
+                related=Exists(
+                    self.model.objects.filter(user=user, recipe=OuterRef('pk'))
+                )
             )
-        deleted, _ = ShoppingList.objects.filter(
-            user=request.user, recipe_id=id
-        ).delete()
-        if deleted:
-            return Response(status=status.HTTP_204_NO_CONTENT)
-        return Response(
-            {'error': 'Рецепт отсутствует в избранном'},
-            status=status.HTTP_400_BAD_REQUEST,
+            .order_by()
+            .values_list('id', 'related')
+        )
+
+    def get_results(self, recipe_ids, states, found, missing):
+        results = []
+        for recipe_id in recipe_ids:
+            if recipe_id not in states:
+                result = 'not_found'
+            elif states[recipe_id]:
+                result = found
+            else:
+                result = missing
+            results.append({'id': recipe_id, 'status': result})
+        return Response({'results': results}, status=status.HTTP_200_OK)
+
+    def post(self, request):
+        recipe_ids = self.get_recipe_ids(request)
+        states = self.get_states(request.user, recipe_ids)
+        self.model.objects.bulk_create(
+            [
+                self.model(user=request.user, recipe_id=recipe_id)
+                for recipe_id, related in states.items()
+                if not related
+            ],
+            ignore_conflicts=True,
         )
+        return self.get_results(recipe_ids, states, 'exists', 'added')
+
+    def delete(self, request):
+        recipe_ids = self.get_recipe_ids(request)
+        states = self.get_states(request.user, recipe_ids)
+        self.model.objects.filter(
+            user=request.user,
+            recipe_id__in=[
+                recipe_id for recipe_id, related in states.items() if related
+            ],
+        ).delete()
+        return self.get_results(recipe_ids, states, 'removed', 'absent')
 
 
-class DownloadShoppingCartView(APIView):
-    permission_classes = [IsAuthenticated]
+class FavoriteRecipeBatchView(RecipeRelationBatchView):
+    model = FavoriteRecipe
+
 
-    def content_prepare(self, ingredients):
-        return '\n'.join(
+class ShoppingCartBatchView(RecipeRelationBatchView):
+    model = ShoppingList
+
+
+class RecipeCreateBatchView(APIView):
+    """Создание пакета рецептов с ошибками по каждому элементу."""
+
+    permission_classes = [IsAuthenticated]
+    throttle_classes = [ScopedTokenBucketThrottle, ScopedIPTokenBucketThrottle]
+    throttle_scope = 'recipe_write'
+
+    def validate_items(self, items):
+        valid, errors = {}, {}
+        for index, data in enumerate(items):
+            serializer = RecipeBatchItemSerializer(data=data)
+            if serializer.is_valid():
+                valid[index] = serializer.validated_data
+            else:
+                errors[index] = serializer.errors
+        tag_ids = set(
+            Tag.objects.filter(
+                id__in={pk for data in valid.values() for pk in data['tags']}
+            ).values_list('id', flat=True)
+        )
+        ingredient_ids = set(
+            Ingredient.objects.filter(
+                id__in={
+                    item['id']
+                    for data in valid.values()
+                    for item in data['ingredients']
+                }
+            ).values_list('id', flat=True)
+        )
+        for index, data in list(valid.items()):
+            if not set(data['tags']) <= tag_ids:
+                errors[index] = {'tags': ['Тег не существует']}
+            elif not {item['id'] for item in data['ingredients']} <= (
+                ingredient_ids
+            ):
+                errors[index] = {'ingredients': ['Игредиент не существует']}
+            else:
+                continue
+            del valid[index]
+        return valid, errors
+
+    @staticmethod
+    def save_image(value):
+        image = Base64ImageField().to_internal_value(value)
+        name = Recipe._meta.get_field('image').generate_filename(
+            None, image.name
+        )
+        return default_storage.save(name, image)
+
+    def save_images(self, valid, errors):
+        """Декодирует и сохраняет картинки в ограниченном пуле потоков."""
+        with ThreadPoolExecutor(RECIPE_BATCH_IMAGE_WORKERS) as executor:
+            futures = {
+                index: executor.submit(self.save_image, data['image'])
+                for index, data in valid.items()
+            }
+        images = {}
+        for index, future in futures.items():
+            try:
+                images[index] = future.result()
+            except ValidationError as error:
+                errors[index] = {'image': error.detail}
+            except DjangoValidationError as error:
+                errors[index] = {'image': error.messages}
+            except (ValueError, binascii.Error):
+                errors[index] = {'image': ['Некорректная картинка']}
+            else:
+                continue
+            del valid[index]
+        return images
+
+    @transaction.atomic
+    def create_recipes(self, author, valid, images):
+        recipes = Recipe.objects.bulk_create(
             [
-                f"{row['ingredient__name']} — {row['amount']} "
-                f"{row['ingredient__measurement_unit']}"
-                for row in ingredients
+                Recipe(
+                    author=author,
+                    name=data['name'],
+                    text=data['text'],
+                    cooking_time=data['cooking_time'],
+                    image=images[index],
+                )
+                for index, data in valid.items()
             ]
         )
+        Recipe.tags.through.objects.bulk_create(
+            [
+                Recipe.tags.through(recipe_id=recipe.id, tag_id=tag_id)
+                for recipe, data in zip(recipes, valid.values())
+                for tag_id in data['tags']
+            ]
+        )
+        RecipeIngredient.objects.bulk_create(
+            [
+                RecipeIngredient(
+                    recipe_id=recipe.id,
+                    ingredient_id=item['id'],
+                    amount=item['amount'],
+                )
+                for recipe, data in zip(recipes, valid.values())
+                for item in data['ingredients']
+            ]
+        )
+        recipe_ids = [recipe.id for recipe in recipes]
+        # bulk_create не отправляет post_save: рассылка и сброс кэшей явно.
+        feed.fan_out_recipes(author.id, recipe_ids)
+        recipe_changed.send(
+            sender=Recipe, recipe_ids=recipe_ids, deleted=False
+        )
+        return dict(zip(valid, recipe_ids))
 
-    def get(self, request):
-        user = request.user
-        ingredients_list = (
-            RecipeIngredient.objects.filter(
-                recipe__in_shopping_lists__user=user
+    def post(self, request):
+        serializer = RecipeCreateBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        items = serializer.validated_data['recipes']
+        valid, errors = self.validate_items(items)
+        images = self.save_images(valid, errors)
+        created = {}
+        if valid:
+            created = self.create_recipes(request.user, valid, images)
+        results = [
+            (
+                {'id': created[index]}
+                if index in created
+                else {'errors': errors[index]}
             )
-            .values('ingredient__name', 'ingredient__measurement_unit')
-            .annotate(amount=Sum('amount'))
-            .order_by('ingredient__name', 'ingredient__measurement_unit')
+            for index in range(len(items))
+        ]
+        return Response(
+            {'results': results},
+            status=(
+                status.HTTP_201_CREATED
+                if created
+                else status.HTTP_400_BAD_REQUEST
+            ),
         )
+
+
+class DownloadShoppingCartView(APIView):
+    """Список покупок файлом; большую корзину может собрать фоновая задача.
+
+    Клиент, приславший ``Prefer: respond-async``, для корзины от
+    ``SHOPPING_LIST_ASYNC_MIN_RECIPES`` рецептов получает 202 с задачей;
+    текст списка появится в её результате. Остальные получают файл сразу.
+    """
+
+    permission_classes = [IsAuthenticated]
+    throttle_classes = [ScopedTokenBucketThrottle, ScopedIPTokenBucketThrottle]
+    throttle_scope = 'shopping_cart_download'
+
+    def get(self, request):
+        if (
+            'respond-async' in request.headers.get('Prefer', '')
+            and ShoppingList.objects.filter(user=request.user).count()
+            >= SHOPPING_LIST_ASYNC_MIN_RECIPES
+        ):
+            job = queue.enqueue(
+                export_shopping_list,
+                user=request.user,
+                user_id=request.user.id,
+            )
+            return Response(
+                JobSerializer(job).data,
+                status=status.HTTP_202_ACCEPTED,
+                headers={'Location': reverse('job', args=[job.pk])},
+            )
         response = HttpResponse(
-            self.content_prepare(ingredients_list), content_type='text/plain'
+            shopping_list.render(
+                shopping_list.get_ingredients(request.user.id)
+            ),
+            content_type='text/plain',
         )
         response['Content-Disposition'] = (
-            'attachment; ' 'filename="shopping_list.txt"'
+            f'attachment; filename="{shopping_list.FILENAME}"'
         )
         return response
 
 
+class JobView(generics.RetrieveAPIView):
+    """Состояние фоновой задачи пользователя."""
+
+    serializer_class = JobSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        if self.request.user.is_staff:
+            return Job.objects.all()
+        return Job.objects.filter(user=self.request.user)
+
+
+class ThrottleStatsView(APIView):
+    """Число отклонённых ограничителем запросов по областям."""
+
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(get_rejection_counts())
+
+
+class MetricsView(APIView):
+    """Метрики всех воркеров в текстовом формате Prometheus."""
+
+    permission_classes = [IsStaffOrInternalNetwork]
+
+    def get(self, request):
+        return HttpResponse(
+            metrics.render(),
+            content_type='text/plain; version=0.0.4; charset=utf-8',
+        )
+
+
 class CustomUserViewSet(UserViewSet):
+    queryset = User.objects.filter(is_active=True).order_by('id')
     permission_classes = [AllowAny]
-    pagination_class = CustomPageNumberPagination
+    pagination_class = EstimatedCountPagination
 
     @action(
         detail=False, methods=['get'], permission_classes=[IsAuthenticated]
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -29,9 +30,11 @@ INSTALLED_APPS = [
     'api.apps.ApiConfig',
     'user.apps.UserConfig',
     'recipes.apps.RecipesConfig',
+    'jobs.apps.JobsConfig',
 ]
 
 MIDDLEWARE = [
+    'utils.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -39,6 +42,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'utils.db_router.PrimaryPinMiddleware',
+    'utils.traffic.TrafficRecordingMiddleware',
 ]
 
 ROOT_URLCONF = 'foodgram.urls'
@@ -70,6 +75,43 @@ DATABASES = {
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
         'HOST': os.getenv('DB_HOST', ''),
         'PORT': os.getenv('DB_PORT', 5432),
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+    }
+}
+
+# Реплики только для чтения: DB_REPLICA_HOSTS=replica1,replica2:5433
+for number, host in enumerate(
+    filter(None, os.getenv('DB_REPLICA_HOSTS', '').split(',')), start=1
+):
+    host, _, port = host.strip().partition(':')
+    DATABASES[f'replica_{number}'] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': port or DATABASES['default']['PORT'],
+    }
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['utils.db_router.ReplicaRouter']
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', 10))
+
+# Кэш в общей памяти: один на все воркеры хоста, без Redis и memcached.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'utils.shared_cache.SharedMemoryCache'
+        ),
+        'LOCATION': os.getenv(
+            'CACHE_LOCATION',
+            os.path.join(
+                '/dev/shm' if os.path.isdir('/dev/shm')
+                else tempfile.gettempdir(),
+                'foodgram-cache',
+            ),
+        ),
+        'OPTIONS': {
+            'MAX_SIZE': int(os.getenv('CACHE_MAX_SIZE', 32 * 1024 * 1024)),
+        },
     }
 }
 
@@ -105,6 +147,15 @@ STATIC_ROOT = BASE_DIR / 'static/'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+STORAGES = {
+    'default': {
+        'BACKEND': 'utils.storage.ContentAddressedStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -118,6 +169,17 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
+    # Перед приложением стоит nginx: адрес клиента берётся из
+    # X-Forwarded-For, добавленного им.
+    'NUM_PROXIES': 1,
+    'DEFAULT_THROTTLE_RATES': {
+        'shopping_cart_download': '10/min',
+        'shopping_cart_download_ip': '30/min',
+        'ingredients': '120/min',
+        'ingredients_ip': '600/min',
+        'recipe_write': '20/min',
+        'recipe_write_ip': '60/min',
+    },
 }
 
 
@@ -136,3 +198,28 @@ DJOSER = {
 }
 
 AUTH_USER_MODEL = 'user.User'
+
+# Окна популярности рецептов: период полураспада оценки в секундах.
+TRENDING_HALF_LIVES = {
+    'day': 60 * 60 * 24,
+    'week': 60 * 60 * 24 * 7,
+    'month': 60 * 60 * 24 * 30,
+}
+TRENDING_DEFAULT_WINDOW = 'week'
+TRENDING_FAVORITE_WEIGHT = 1.0
+TRENDING_CART_WEIGHT = 2.0
+
+# Метрики Prometheus: файлы процессов и сети, которым открыт /metrics.
+METRICS_DIR = os.getenv(
+    'METRICS_DIR', os.path.join(tempfile.gettempdir(), 'foodgram-metrics')
+)
+METRICS_FLUSH_INTERVAL = int(os.getenv('METRICS_FLUSH_INTERVAL', 5))
+METRICS_ALLOWED_NETWORKS = os.getenv(
+    'METRICS_ALLOWED_NETWORKS', '127.0.0.0/8,10.0.0.0/8,172.16.0.0/12'
+).split(',')
+
+# Запись трафика для replay_traffic; пустой путь — запись выключена.
+TRAFFIC_RECORDING_PATH = os.getenv('TRAFFIC_RECORDING_PATH', '')
+TRAFFIC_RECORDING_SAMPLE_RATE = float(
+    os.getenv('TRAFFIC_RECORDING_SAMPLE_RATE', 1)
+)
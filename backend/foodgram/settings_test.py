@@ -0,0 +1,37 @@
+"""Настройки тестов: две базы SQLite вместо основной базы и реплики.
+
+python manage.py test --settings=foodgram.settings_test
+"""
+import os
+import tempfile
+
+os.environ.setdefault('SECRET_KEY', 'test')
+os.environ.setdefault('ALLOWED_HOSTS', 'testserver')
+os.environ.setdefault('DEBUG', 'False')
+
+from foodgram.settings import *  # noqa: E402,F401,F403
+
+TEST_DIR = tempfile.gettempdir()
+
+# Файлы, а не память: тесты обращаются к базам из нескольких потоков.
+DATABASES = {
+    alias: {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(TEST_DIR, f'foodgram-{alias}.sqlite3'),
+        'OPTIONS': {'timeout': 30},
+        'TEST': {
+            'NAME': os.path.join(TEST_DIR, f'foodgram-test-{alias}.sqlite3'),
+        },
+    }
+    for alias in ('default', 'replica_1')
+}
+DATABASE_REPLICAS = ['replica_1']
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Неключевые столбцы индексов SQLite не поддерживает и просто пропускает.
+SILENCED_SYSTEM_CHECKS = ['models.W040']
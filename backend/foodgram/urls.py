@@ -3,6 +3,8 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from api.views import MetricsView
+
 # from user.views import ChangePasswordView, CustomUserViewSet
 
 # router = DefaultRouter()
@@ -11,6 +13,8 @@ from django.urls import include, path
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('api.urls')),
+    # Снаружи не проксируется nginx: Prometheus ходит напрямую в backend.
+    path('metrics', MetricsView.as_view(), name='metrics'),
     # path(
     #     'api/users/me/avatar/',
     #     CustomUserViewSet.as_view({'put': 'avatar', 'delete': 'avatar'}),
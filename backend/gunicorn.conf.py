@@ -0,0 +1,69 @@
+"""Настройки gunicorn для контейнера backend.
+
+Значения можно переопределить переменными окружения ``GUNICORN_*``.
+"""
+import multiprocessing
+import os
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+
+# Воркеры большую часть времени ждут БД, поэтому потоки дешевле
+# процессов; число процессов ограничено, чтобы не исчерпать соединения.
+workers = int(
+    os.getenv('GUNICORN_WORKERS', min(multiprocessing.cpu_count() * 2 + 1, 9))
+)
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+
+# Django импортируется один раз в мастере, воркеры получают его через fork.
+preload_app = True
+
+# Перезапуск воркеров против утечек памяти; разброс, чтобы они не
+# перезапускались одновременно.
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+graceful_timeout = 30
+keepalive = 5
+worker_tmp_dir = '/dev/shm'
+accesslog = '-'
+
+
+def on_starting(server):
+    from utils.metrics import reset_storage
+
+    reset_storage()
+
+
+def when_ready(server):
+    from utils.warmup import load_modules
+
+    load_modules()
+
+
+def post_fork(server, worker):
+    # Соединения, открытые в мастере, нельзя делить между процессами.
+    from django.db import connections
+
+    connections.close_all()
+
+
+def post_worker_init(worker):
+    from utils.warmup import warm_up
+
+    # Пул потоков-обработчиков gthread создан до этого хука.
+    elapsed = warm_up(getattr(worker, 'tpool', None), worker.cfg.threads)
+    worker.log.info('Воркер прогрет за %.3f с', elapsed)
+
+
+def worker_exit(server, worker):
+    from utils.metrics import registry
+
+    registry.flush(force=True)
+
+
+def child_exit(server, worker):
+    from utils.metrics import archive_process
+
+    archive_process(worker.pid)
@@ -0,0 +1,44 @@
+from django.contrib import admin
+from django.utils import timezone
+
+from jobs.models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = (
+        'id', 'name', 'status', 'attempts', 'user', 'run_at', 'updated_at'
+    )
+    list_filter = ('status', 'name')
+    list_select_related = ('user',)
+    search_fields = ('name',)
+    readonly_fields = (
+        'name',
+        'payload',
+        'status',
+        'user',
+        'attempts',
+        'max_attempts',
+        'run_at',
+        'locked_by',
+        'locked_at',
+        'result',
+        'error',
+        'created_at',
+        'updated_at',
+    )
+    actions = ('retry',)
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.action(description='Повторить')
+    def retry(self, request, queryset):
+        updated = queryset.exclude(status=Job.RUNNING).update(
+            status=Job.PENDING,
+            attempts=0,
+            run_at=timezone.now(),
+            updated_at=timezone.now(),
+        )
+        self.message_user(request, f'Поставлено в очередь: {updated}')
@@ -0,0 +1,63 @@
+import os
+import signal
+import socket
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from jobs.queue import claim, requeue_stale, run
+from utils.constants import JOB_POLL_INTERVAL
+
+
+class Command(BaseCommand):
+    help = "Выполнять фоновые задачи из очереди"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Выполнить готовые задачи и завершиться',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=JOB_POLL_INTERVAL,
+            help='Пауза при пустой очереди, секунд',
+        )
+        parser.add_argument(
+            '--max-jobs',
+            type=int,
+            help='Завершиться после стольких задач',
+        )
+
+    def stop(self, signum, frame):
+        # Текущая задача доводится до конца.
+        self.running = False
+
+    def handle(self, *args, **options):
+        worker = f'{socket.gethostname()}:{os.getpid()}'
+        self.running = True
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        processed = failed = 0
+        requeue_stale()
+        while self.running:
+            close_old_connections()
+            job = claim(worker)
+            if job is None:
+                if options['once']:
+                    break
+                requeue_stale()
+                time.sleep(options['sleep'])
+                continue
+            if not run(job):
+                failed += 1
+            processed += 1
+            if options['max_jobs'] and processed >= options['max_jobs']:
+                break
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Выполнено задач: {processed}, с ошибкой: {failed}"
+            )
+        )
@@ -0,0 +1,83 @@
+from django.contrib.auth import get_user_model
+from django.db import models
+from django.utils import timezone
+
+from utils.constants import JOB_MAX_ATTEMPTS, JOB_NAME_MAX_LENGTH
+
+User = get_user_model()
+
+
+class Job(models.Model):
+    """Фоновая задача в очереди на выполнение командой runworker."""
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Завершено'),
+        (FAILED, 'Ошибка'),
+    )
+
+    name = models.CharField(
+        max_length=JOB_NAME_MAX_LENGTH, verbose_name='Задача'
+    )
+    payload = models.JSONField(default=dict, verbose_name='Аргументы')
+    status = models.CharField(
+        max_length=16,
+        choices=STATUS_CHOICES,
+        default=PENDING,
+        verbose_name='Статус',
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='jobs',
+        verbose_name='Пользователь',
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0, verbose_name='Попыток'
+    )
+    max_attempts = models.PositiveSmallIntegerField(
+        default=JOB_MAX_ATTEMPTS, verbose_name='Максимум попыток'
+    )
+    run_at = models.DateTimeField(
+        default=timezone.now, verbose_name='Выполнить после'
+    )
+    locked_by = models.CharField(
+        max_length=255, blank=True, verbose_name='Воркер'
+    )
+    locked_at = models.DateTimeField(
+        null=True, blank=True, verbose_name='Взята в работу'
+    )
+    result = models.JSONField(null=True, blank=True, verbose_name='Результат')
+    error = models.TextField(blank=True, verbose_name='Ошибка')
+    created_at = models.DateTimeField(
+        auto_now_add=True, verbose_name='Создано'
+    )
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Обновлено')
+
+    class Meta:
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+        ordering = ['-id']
+        indexes = [
+            # Воркер выбирает только ожидающие задачи по времени запуска.
+            models.Index(
+                fields=['run_at', 'id'],
+                name='job_pending_idx',
+                condition=models.Q(status='pending'),
+            ),
+            models.Index(
+                fields=['locked_at'],
+                name='job_running_idx',
+                condition=models.Q(status='running'),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk}"
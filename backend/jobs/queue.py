@@ -0,0 +1,190 @@
+"""Очередь фоновых задач в таблице БД, без отдельного брокера.
+
+Задача — функция, зарегистрированная декоратором ``task`` в модуле
+``tasks.py`` приложения; аргументы хранятся в JSON. ``enqueue`` можно
+вызывать внутри транзакции: задача станет видна воркеру только вместе с
+остальными изменениями. Воркер (``runworker``) забирает задачу через
+``SELECT ... FOR UPDATE SKIP LOCKED``, поэтому несколько воркеров не
+мешают друг другу; на SQLite, где такой блокировки нет, захват
+защищает условный UPDATE по статусу. Упавшая задача повторяется с
+экспоненциальной задержкой, пока не исчерпает ``max_attempts``; задача
+умершего воркера возвращается в очередь через ``JOB_LOCK_TIMEOUT``.
+Долгая задача периодически вызывает ``heartbeat``, чтобы её не сочли
+брошенной.
+"""
+import logging
+import random
+import traceback
+from contextlib import nullcontext
+from contextvars import ContextVar
+from datetime import timedelta
+
+from django.db import connections, router, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from jobs.models import Job
+from utils.constants import (
+    JOB_HEARTBEAT_INTERVAL,
+    JOB_LOCK_TIMEOUT,
+    JOB_MAX_ATTEMPTS,
+    JOB_RETRY_BASE_DELAY,
+    JOB_RETRY_MAX_DELAY,
+)
+
+logger = logging.getLogger(__name__)
+
+TASKS = {}
+
+_current_job = ContextVar('current_job', default=None)
+
+
+class JobLost(Exception):
+    """Задачу вернули в очередь и отдали другому воркеру."""
+
+
+def task(name, max_attempts=JOB_MAX_ATTEMPTS):
+    """Регистрирует функцию как фоновую задачу с именем ``name``."""
+
+    def register(function):
+        function.job_name = name
+        function.max_attempts = max_attempts
+        TASKS[name] = function
+        return function
+
+    return register
+
+
+def enqueue(function, user=None, delay=0, **payload):
+    """Ставит задачу в очередь; ``payload`` должен сериализоваться в JSON."""
+    return Job.objects.create(
+        name=function.job_name,
+        payload=payload,
+        user=user,
+        max_attempts=function.max_attempts,
+        run_at=timezone.now() + timedelta(seconds=delay),
+    )
+
+
+def claim(worker):
+    """Забирает одну готовую задачу; None, если очередь пуста."""
+    using = router.db_for_write(Job)
+    skip_locked = connections[using].features.has_select_for_update_skip_locked
+    while True:
+        now = timezone.now()
+        queryset = (
+            Job.objects.using(using)
+            .filter(status=Job.PENDING, run_at__lte=now)
+            .order_by('run_at', 'id')
+        )
+        # Без SKIP LOCKED транзакция не нужна: атомарен сам условный
+        # UPDATE, а в SQLite чтение с последующей записью в одной
+        # транзакции упирается во взаимную блокировку воркеров.
+        with transaction.atomic(using=using) if skip_locked else nullcontext():
+            if skip_locked:
+                queryset = queryset.select_for_update(skip_locked=True)
+            job = queryset.first()
+            if job is None:
+                return None
+            claimed = (
+                Job.objects.using(using)
+                .filter(pk=job.pk, status=Job.PENDING)
+                .update(
+                    status=Job.RUNNING,
+                    attempts=F('attempts') + 1,
+                    locked_by=worker,
+                    locked_at=now,
+                    updated_at=now,
+                )
+            )
+        if claimed:
+            job.refresh_from_db(using=using)
+            return job
+
+
+def retry_delay(attempts):
+    delay = min(
+        JOB_RETRY_MAX_DELAY, JOB_RETRY_BASE_DELAY * 2 ** (attempts - 1)
+    )
+    # Разброс, чтобы одновременно упавшие задачи не вернулись разом.
+    return delay * random.uniform(0.5, 1)
+
+
+def finish(job, **fields):
+    # Условие на воркера: задачу могли вернуть в очередь по таймауту
+    # и отдать другому воркеру.
+    return Job.objects.filter(
+        pk=job.pk, status=Job.RUNNING, locked_by=job.locked_by
+    ).update(locked_by='', locked_at=None, updated_at=timezone.now(), **fields)
+
+
+def heartbeat():
+    """Продлевает блокировку выполняемой задачи; вне задачи ничего не делает.
+
+    Вызывается не чаще раза в ``JOB_HEARTBEAT_INTERVAL`` секунд. Если
+    задачу уже отдали другому воркеру, бросает ``JobLost``.
+    """
+    job = _current_job.get()
+    if job is None:
+        return
+    now = timezone.now()
+    if (now - job.locked_at).total_seconds() < JOB_HEARTBEAT_INTERVAL:
+        return
+    if not Job.objects.filter(
+        pk=job.pk, status=Job.RUNNING, locked_by=job.locked_by
+    ).update(locked_at=now, updated_at=now):
+        raise JobLost(f"Задача {job} передана другому воркеру")
+    job.locked_at = now
+
+
+def run(job):
+    """Выполняет захваченную задачу; True, если она завершилась успешно."""
+    function = TASKS.get(job.name)
+    token = _current_job.set(job)
+    try:
+        if function is None:
+            raise LookupError(f"Задача {job.name} не зарегистрирована")
+        result = function(**job.payload)
+    except JobLost:
+        logger.warning('Задача %s передана другому воркеру', job)
+        return False
+    except Exception:
+        logger.exception('Задача %s завершилась ошибкой', job)
+        if job.attempts < job.max_attempts:
+            run_at = timezone.now() + timedelta(
+                seconds=retry_delay(job.attempts)
+            )
+            finish(
+                job,
+                status=Job.PENDING,
+                run_at=run_at,
+                error=traceback.format_exc(),
+            )
+        else:
+            finish(job, status=Job.FAILED, error=traceback.format_exc())
+        return False
+    finally:
+        _current_job.reset(token)
+    if not finish(job, status=Job.DONE, result=result, error=''):
+        logger.warning(
+            'Задача %s выполнена, но уже передана другому воркеру', job
+        )
+    return True
+
+
+def requeue_stale():
+    """Возвращает в очередь задачи воркеров, переставших отвечать.
+
+    Задача, исчерпавшая попытки, считается проваленной: возможно, именно
+    она и роняет воркер.
+    """
+    now = timezone.now()
+    stale = Job.objects.filter(
+        status=Job.RUNNING,
+        locked_at__lt=now - timedelta(seconds=JOB_LOCK_TIMEOUT),
+    )
+    released = {'locked_by': '', 'locked_at': None, 'updated_at': now}
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.FAILED, error='Воркер не завершил задачу', **released
+    )
+    return failed + stale.update(status=Job.PENDING, run_at=now, **released)
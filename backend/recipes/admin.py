@@ -1,6 +1,10 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 
+from recipes.deletion import process_deletion, schedule_deletion
 from recipes.models import (
+    DeletionTask,
     FavoriteRecipe,
     Ingredient,
     Recipe,
@@ -9,6 +13,7 @@ from recipes.models import (
     Subscription,
     Tag,
 )
+from utils.pagination import EstimatedCountPaginator
 
 
 @admin.register(Ingredient)
@@ -28,55 +33,114 @@ class RecipeIngredientInline(admin.TabularInline):
     model = RecipeIngredient
     extra = 1
     min_num = 1
+    autocomplete_fields = ('ingredient',)
 
 
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
     list_display = ("name", "author", "cooking_time", "favorite_count")
     search_fields = ("name", "author__username")
-    list_filter = ("tags",)
+    list_filter = ("tags", "is_hidden")
+    list_select_related = ("author",)
+    autocomplete_fields = ("author",)
     inlines = (RecipeIngredientInline,)
+    actions = ('delete_in_background',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
-    @admin.display(description='кол.во избранных')
+    @admin.display(description='кол.во избранных', ordering='favorite_count')
     def favorite_count(self, obj):
-        return obj.favorited_by.count()
+        return obj.favorite_count
 
     def get_queryset(self, request):
-        queryset = super().get_queryset(request)
-        queryset = queryset.select_related('author').prefetch_related(
-            'tags', 'ingredients'
+        # Коррелированный подзапрос считается только для строк страницы,
+        # в отличие от JOIN + GROUP BY по всей таблице избранного.
+        favorites = (
+            FavoriteRecipe.objects.filter(recipe=OuterRef('pk'))
+            .order_by()
+            .values('recipe')
+            .annotate(count=Count('id'))
+            .values('count')
+        )
+        return (
+            super()
+            .get_queryset(request)
+            .annotate(
+                favorite_count=Coalesce(
+                    Subquery(favorites, output_field=IntegerField()), 0
+                )
+            )
+        )
+
+    @admin.action(description='Удалить в фоне')
+    def delete_in_background(self, request, queryset):
+        for recipe in queryset:
+            schedule_deletion(recipe)
+        self.message_user(
+            request,
+            f'Рецептов скрыто и поставлено в очередь: {len(queryset)}',
+            messages.SUCCESS,
         )
-        return queryset
 
 
 @admin.register(Subscription)
 class SubscriptionAdmin(admin.ModelAdmin):
     list_display = ('user', 'author')
     search_fields = ('user__username', 'author__username')
-
-    def get_queryset(self, request):
-        queryset = super().get_queryset(request)
-        queryset = queryset.select_related('user', 'author')
-        return queryset
+    list_select_related = ('user', 'author')
+    autocomplete_fields = ('user', 'author')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 @admin.register(ShoppingList)
 class ShoppingListAdmin(admin.ModelAdmin):
     list_display = ('user', 'recipe')
     search_fields = ('user__username', 'recipe__name')
-
-    def get_queryset(self, request):
-        queryset = super().get_queryset(request)
-        queryset = queryset.select_related('user', 'recipe')
-        return queryset
+    list_select_related = ('user', 'recipe')
+    autocomplete_fields = ('user', 'recipe')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 @admin.register(FavoriteRecipe)
 class FavoriteRecipeAdmin(admin.ModelAdmin):
     list_display = ('user', 'recipe')
     search_fields = ('user__username', 'recipe__name')
-
-    def get_queryset(self, request):
-        queryset = super().get_queryset(request)
-        queryset = queryset.select_related('user', 'recipe')
-        return queryset
+    list_select_related = ('user', 'recipe')
+    autocomplete_fields = ('user', 'recipe')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+@admin.register(DeletionTask)
+class DeletionTaskAdmin(admin.ModelAdmin):
+    list_display = (
+        'kind', 'object_id', 'title', 'status', 'deleted', 'updated_at'
+    )
+    list_filter = ('kind', 'status')
+    readonly_fields = (
+        'kind',
+        'object_id',
+        'title',
+        'status',
+        'deleted',
+        'error',
+        'created_at',
+        'updated_at',
+    )
+    actions = ('run',)
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.action(description='Выполнить сейчас')
+    def run(self, request, queryset):
+        for task in queryset.exclude(status=DeletionTask.DONE):
+            try:
+                if not process_deletion(task):
+                    self.message_user(
+                        request, f'{task}: уже выполняется', messages.WARNING
+                    )
+            except Exception as error:
+                self.message_user(request, f'{task}: {error}', messages.ERROR)
@@ -0,0 +1,83 @@
+"""Кэш справочных данных, которые меняются редко."""
+import gzip
+import hashlib
+from uuid import uuid4
+
+from django.core.cache import cache
+
+from recipes.models import Tag
+from utils import metrics
+from utils.constants import REFERENCE_CACHE_TIMEOUT, REFERENCE_GZIP_LEVEL
+
+TAGS_CACHE_KEY = 'tags:slug_map'
+
+
+def get_version(name):
+    """Текущая версия набора данных, общая для всех процессов.
+
+    Версия — случайная строка, поэтому вытеснение ключа из кэша приводит
+    к перестроению производных данных, а не к использованию устаревших.
+    """
+    key = f'version:{name}'
+    version = cache.get(key)
+    metrics.record_cache('version', version is not None)
+    if version is None:
+        version = uuid4().hex
+        cache.add(key, version, REFERENCE_CACHE_TIMEOUT)
+        version = cache.get(key, version)
+    return version
+
+
+def bump_version(name):
+    cache.set(f'version:{name}', uuid4().hex, REFERENCE_CACHE_TIMEOUT)
+
+
+def get_tag_ids_by_slug():
+    """Словарь slug -> id всех тегов."""
+    tags = cache.get(TAGS_CACHE_KEY)
+    metrics.record_cache('tags', tags is not None)
+    if tags is None:
+        tags = dict(Tag.objects.values_list('slug', 'id'))
+        cache.set(TAGS_CACHE_KEY, tags, REFERENCE_CACHE_TIMEOUT)
+    return tags
+
+
+def invalidate_tags():
+    cache.delete(TAGS_CACHE_KEY)
+    bump_version('tags')
+
+
+class ReferenceBody:
+    """Готовое тело ответа справочника и его сжатый вариант.
+
+    ``tag`` — хеш содержимого: он не меняется при перезапуске или
+    вытеснении версии из кэша, поэтому годится для strong ETag.
+    """
+
+    def __init__(self, version, content):
+        self.version = version
+        self.tag = hashlib.sha256(content).hexdigest()[:32]
+        self.encodings = {
+            'identity': content,
+            'gzip': gzip.compress(content, REFERENCE_GZIP_LEVEL, mtime=0),
+        }
+
+
+_reference_bodies = {}
+
+
+def get_reference_body(name, render):
+    """Тело ответа набора ``name`` из памяти процесса.
+
+    ``render`` возвращает JSON в байтах и вызывается, только когда
+    версия набора изменилась с прошлого раза.
+    """
+    version = get_version(name)
+    body = _reference_bodies.get(name)
+    metrics.record_cache(
+        'reference_body', body is not None and body.version == version
+    )
+    if body is None or body.version != version:
+        body = ReferenceBody(version, render())
+        _reference_bodies[name] = body
+    return body
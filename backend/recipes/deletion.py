@@ -0,0 +1,143 @@
+"""Отложенное удаление пользователей и рецептов с большим числом связей.
+
+Обычный ``delete()`` собирает все зависимые строки в память и удаляет
+их одной долгой транзакцией. Здесь объект сразу скрывается (рецепт —
+флагом ``is_hidden``, пользователь — ``is_active=False``), а зависимые
+строки затем удаляются партиями по ``DELETION_BATCH_SIZE``: сначала
+листья, потом родители, каждая партия в своей короткой транзакции.
+Прерванную задачу можно запустить снова — она продолжит с того, что
+осталось. Выполняет задачи воркер очереди (``runworker``) или команда
+``process_deletions``; задачу одновременно выполняет только один из них,
+а выполняющаяся задача без новых партий дольше
+``DELETION_LOCK_TIMEOUT`` считается прерванной.
+"""
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import models, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from jobs import queue
+from recipes.cache import bump_version
+from recipes.models import DeletionTask, Recipe
+from recipes.signals import recipe_changed
+from utils.constants import (
+    DELETION_BATCH_SIZE,
+    DELETION_LOCK_TIMEOUT,
+    RICIPE_NAME_MAX_LENGTH,
+)
+
+User = get_user_model()
+
+MODELS = {DeletionTask.USER: User, DeletionTask.RECIPE: Recipe}
+
+
+def cascade_relations(model):
+    """Обратные связи, строки которых удаляются вместе с ``model``."""
+    for field in model._meta.get_fields(include_hidden=True):
+        if (
+            field.auto_created
+            and not field.concrete
+            and (field.one_to_many or field.one_to_one)
+            and field.on_delete is models.CASCADE
+        ):
+            yield field.related_model, field.field.name
+
+
+@transaction.atomic
+def schedule_deletion(obj):
+    """Скрывает объект и ставит его удаление в очередь."""
+    if isinstance(obj, Recipe):
+        kind = DeletionTask.RECIPE
+        Recipe.objects.filter(pk=obj.pk).update(is_hidden=True)
+        recipe_changed.send(sender=Recipe, recipe_ids=[obj.pk], deleted=True)
+    else:
+        kind = DeletionTask.USER
+        User.objects.filter(pk=obj.pk).update(is_active=False)
+        bump_version('recipes')
+    deletion, created = DeletionTask.objects.get_or_create(
+        kind=kind,
+        object_id=obj.pk,
+        status__in=(DeletionTask.PENDING, DeletionTask.RUNNING),
+        defaults={'title': str(obj)[:RICIPE_NAME_MAX_LENGTH]},
+    )
+    if created:
+        queue.enqueue(run_deletion, task_id=deletion.pk)
+    return deletion
+
+
+def delete_batched(queryset, task):
+    """Удаляет строки ``queryset`` и их зависимости партиями."""
+    model = queryset.model
+    relations = list(cascade_relations(model))
+    while True:
+        ids = list(
+            queryset.order_by().values_list('pk', flat=True)[
+                :DELETION_BATCH_SIZE
+            ]
+        )
+        if not ids:
+            return
+        for related_model, field_name in relations:
+            delete_batched(
+                related_model._base_manager.filter(
+                    **{f'{field_name}__in': ids}
+                ),
+                task,
+            )
+        with transaction.atomic():
+            deleted, _ = model._base_manager.filter(pk__in=ids).delete()
+        task.deleted += deleted
+        task.save(update_fields=['deleted', 'updated_at'])
+        queue.heartbeat()
+
+
+def claim(task, retry_failed):
+    """Переводит задачу в RUNNING, если её не выполняет кто-то другой."""
+    statuses = [DeletionTask.PENDING]
+    if retry_failed:
+        statuses.append(DeletionTask.FAILED)
+    stale = timezone.now() - timedelta(seconds=DELETION_LOCK_TIMEOUT)
+    return DeletionTask.objects.filter(
+        Q(status__in=statuses)
+        | Q(status=DeletionTask.RUNNING, updated_at__lt=stale),
+        pk=task.pk,
+    ).update(status=DeletionTask.RUNNING, updated_at=timezone.now())
+
+
+def process_deletion(task, retry_failed=True):
+    """Выполняет задачу; False, если она занята или уже завершена."""
+    if not claim(task, retry_failed):
+        return False
+    task.status = DeletionTask.RUNNING
+    model = MODELS[task.kind]
+    try:
+        delete_batched(model._base_manager.filter(pk=task.object_id), task)
+    except Exception as error:
+        task.status = DeletionTask.FAILED
+        task.error = repr(error)
+        task.save(update_fields=['status', 'error', 'updated_at'])
+        raise
+    task.status = DeletionTask.DONE
+    task.save(update_fields=['status', 'updated_at'])
+    return True
+
+
+@queue.task('recipes.process_deletion', max_attempts=3)
+def run_deletion(task_id):
+    deletion = DeletionTask.objects.filter(pk=task_id).first()
+    if deletion is None or not process_deletion(deletion):
+        return None
+    return {'deleted': deletion.deleted}
+
+
+def process_deletions(include_failed=False):
+    """Выполняет незавершённые задачи; возвращает их число."""
+    statuses = [DeletionTask.PENDING, DeletionTask.RUNNING]
+    if include_failed:
+        statuses.append(DeletionTask.FAILED)
+    processed = 0
+    for task in DeletionTask.objects.filter(status__in=statuses):
+        processed += process_deletion(task, retry_failed=include_failed)
+    return processed
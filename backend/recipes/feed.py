@@ -0,0 +1,156 @@
+"""Лента подписок: рассылка при публикации и слияние при чтении.
+
+Новые рецепты сразу раскладываются по лентам подписчиков (fan-out on
+write). Для популярных авторов рассылка не делается: их рецепты
+подмешиваются в ленту при чтении. Когда автор перестаёт быть популярным,
+фоновая задача раскладывает его последние рецепты по лентам подписчиков
+и только затем убирает его из подмешиваемых.
+"""
+from django.core.cache import cache
+from django.db.models import Count
+
+from jobs.queue import enqueue, task
+from recipes.models import FeedEntry, Recipe, Subscription
+from utils import metrics
+from utils.constants import (
+    FEED_BACKFILL_SIZE,
+    FEED_FANOUT_BATCH_SIZE,
+    FEED_FANOUT_MAX_FOLLOWERS,
+    FEED_POPULAR_CACHE_TIMEOUT,
+)
+
+POPULAR_AUTHORS_CACHE_KEY = 'feed:popular_authors'
+
+
+def get_popular_authors():
+    """Множество id авторов, для которых рассылка не выполняется."""
+    authors = cache.get(POPULAR_AUTHORS_CACHE_KEY)
+    metrics.record_cache('popular_authors', authors is not None)
+    if authors is None:
+        authors = set(
+            Subscription.objects.values('author')
+            .annotate(followers=Count('id'))
+            .filter(followers__gt=FEED_FANOUT_MAX_FOLLOWERS)
+            .values_list('author', flat=True)
+        )
+        cache.set(
+            POPULAR_AUTHORS_CACHE_KEY, authors, FEED_POPULAR_CACHE_TIMEOUT
+        )
+    return authors
+
+
+def mark_popular(author_id):
+    authors = get_popular_authors()
+    if author_id not in authors:
+        cache.set(
+            POPULAR_AUTHORS_CACHE_KEY,
+            authors | {author_id},
+            FEED_POPULAR_CACHE_TIMEOUT,
+        )
+
+
+def is_popular(author_id):
+    return (
+        Subscription.objects.filter(author_id=author_id).count()
+        > FEED_FANOUT_MAX_FOLLOWERS
+    )
+
+
+def create_entries(entries):
+    FeedEntry.objects.bulk_create(
+        entries, batch_size=FEED_FANOUT_BATCH_SIZE, ignore_conflicts=True
+    )
+
+
+def fan_out_recipe(recipe):
+    """Добавляет новый рецепт в ленты всех подписчиков автора."""
+    fan_out_recipes(recipe.author_id, [recipe.id])
+
+
+def fan_out_recipes(author_id, recipe_ids):
+    """Добавляет новые рецепты автора в ленты подписчиков за один проход."""
+    if is_popular(author_id):
+        mark_popular(author_id)
+        return
+    followers = Subscription.objects.filter(author_id=author_id).values_list(
+        'user_id', flat=True
+    )
+    create_entries(
+        FeedEntry(user_id=user_id, recipe_id=recipe_id, author_id=author_id)
+        for user_id in followers.iterator(chunk_size=FEED_FANOUT_BATCH_SIZE)
+        for recipe_id in recipe_ids
+    )
+
+
+def backfill_feed(user_id, author_id):
+    """Заполняет ленту последними рецептами автора после подписки."""
+    if is_popular(author_id):
+        mark_popular(author_id)
+        return
+    recipe_ids = Recipe.objects.filter(author_id=author_id).values_list(
+        'id', flat=True
+    )[:FEED_BACKFILL_SIZE]
+    create_entries(
+        FeedEntry(user_id=user_id, recipe_id=recipe_id, author_id=author_id)
+        for recipe_id in recipe_ids
+    )
+
+
+def drop_author(user_id, author_id):
+    FeedEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+    followers = Subscription.objects.filter(author_id=author_id).count()
+    if followers == FEED_FANOUT_MAX_FOLLOWERS or (
+        followers < FEED_FANOUT_MAX_FOLLOWERS
+        and author_id in get_popular_authors()
+    ):
+        enqueue(backfill_followers, author_id=author_id)
+
+
+@task('recipes.backfill_followers')
+def backfill_followers(author_id):
+    """Раскладывает последние рецепты бывшего популярного автора."""
+    if is_popular(author_id):
+        return
+    recipe_ids = list(
+        Recipe.objects.filter(author_id=author_id).values_list(
+            'id', flat=True
+        )[:FEED_BACKFILL_SIZE]
+    )
+    followers = Subscription.objects.filter(author_id=author_id).values_list(
+        'user_id', flat=True
+    )
+    create_entries(
+        FeedEntry(user_id=user_id, recipe_id=recipe_id, author_id=author_id)
+        for user_id in followers.iterator(chunk_size=FEED_FANOUT_BATCH_SIZE)
+        for recipe_id in recipe_ids
+    )
+    # До этого момента рецепты автора подмешивались при чтении.
+    cache.set(
+        POPULAR_AUTHORS_CACHE_KEY,
+        get_popular_authors() - {author_id},
+        FEED_POPULAR_CACHE_TIMEOUT,
+    )
+
+
+def get_feed_recipe_ids(user, before=None, limit=None):
+    """Id рецептов ленты по убыванию, строго меньше курсора ``before``."""
+    entries = FeedEntry.objects.filter(user=user)
+    if before is not None:
+        entries = entries.filter(recipe_id__lt=before)
+    recipe_ids = list(
+        entries.order_by('-recipe_id').values_list('recipe_id', flat=True)[
+            :limit
+        ]
+    )
+    popular = get_popular_authors()
+    if not popular:
+        return recipe_ids
+    followed = Subscription.objects.filter(
+        user=user, author_id__in=popular
+    ).values('author')
+    recipes = Recipe.objects.filter(author__in=followed)
+    if before is not None:
+        recipes = recipes.filter(id__lt=before)
+    merged = set(recipe_ids)
+    merged.update(recipes.values_list('id', flat=True)[:limit])
+    return sorted(merged, reverse=True)[:limit]
@@ -0,0 +1,65 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand
+
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = "Выгрузить рецепты в файл JSON Lines (по рецепту на строку)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default='-', help="Файл или '-' для stdout"
+        )
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def serialize(self, recipe):
+        author = recipe.author
+        return {
+            'author': {
+                'email': author.email,
+                'username': author.username,
+                'first_name': author.first_name,
+                'last_name': author.last_name,
+            },
+            'name': recipe.name,
+            'text': recipe.text,
+            'cooking_time': recipe.cooking_time,
+            'image': recipe.image.name,
+            'tags': [
+                {'name': tag.name, 'slug': tag.slug}
+                for tag in recipe.tags.all()
+            ],
+            'ingredients': [
+                {
+                    'name': item.ingredient.name,
+                    'measurement_unit': item.ingredient.measurement_unit,
+                    'amount': item.amount,
+                }
+                for item in recipe.recipe_ingredients.all()
+            ],
+        }
+
+    def handle(self, *args, **options):
+        recipes = (
+            Recipe.objects.select_related('author')
+            .prefetch_related('tags', 'recipe_ingredients__ingredient')
+            .order_by('id')
+            .iterator(chunk_size=options['chunk_size'])
+        )
+        path = options['path']
+        file = sys.stdout if path == '-' else open(path, 'w', encoding='utf-8')
+        count = 0
+        try:
+            for recipe in recipes:
+                file.write(
+                    json.dumps(self.serialize(recipe), ensure_ascii=False)
+                    + '\n'
+                )
+                count += 1
+        finally:
+            if file is not sys.stdout:
+                file.close()
+        self.stderr.write(self.style.SUCCESS(f"Выгружено рецептов: {count}"))
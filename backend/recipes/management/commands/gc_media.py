@@ -0,0 +1,67 @@
+import os
+import time
+from pathlib import Path
+
+from django.apps import apps
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db.models import FileField
+
+from utils.storage import ContentAddressedStorage
+
+
+class Command(BaseCommand):
+    help = (
+        "Удалить из медиа файлы, на которые не ссылается ни одна запись "
+        "(картинки рецептов, аватарки)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-age',
+            type=int,
+            default=24 * 60 * 60,
+            help='Не трогать файлы моложе N секунд (загрузки в процессе)',
+        )
+        parser.add_argument('--dry-run', action='store_true')
+
+    def tracked_fields(self):
+        for model in apps.get_models():
+            for field in model._meta.fields:
+                if isinstance(field, FileField) and isinstance(
+                    field.storage, ContentAddressedStorage
+                ):
+                    yield model, field
+
+    def handle(self, *args, **options):
+        referenced = set()
+        directories = set()
+        for model, field in self.tracked_fields():
+            directories.add(str(field.upload_to).split('/')[0])
+            referenced.update(
+                model._base_manager.exclude(**{field.name: ''})
+                .exclude(**{f'{field.name}__isnull': True})
+                .values_list(field.name, flat=True)
+                .iterator()
+            )
+        storage = default_storage
+        root = Path(storage.location)
+        deadline = time.time() - options['min_age']
+        removed = 0
+        for directory in sorted(directories):
+            for path, _, files in os.walk(root / directory):
+                for file_name in files:
+                    full_path = Path(path) / file_name
+                    name = full_path.relative_to(root).as_posix()
+                    if (
+                        name in referenced
+                        or full_path.stat().st_mtime > deadline
+                    ):
+                        continue
+                    removed += 1
+                    self.stdout.write(f"Удаляем {name}")
+                    if not options['dry_run']:
+                        storage.purge(name)
+        self.stdout.write(
+            self.style.SUCCESS(f"Неиспользуемых файлов: {removed}")
+        )
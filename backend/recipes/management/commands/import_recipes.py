@@ -0,0 +1,171 @@
+import json
+from itertools import islice
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.cache import bump_version, invalidate_tags
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Загрузить рецепты из JSON Lines, созданного export_recipes. "
+        "Рецепт с тем же автором и названием повторно не создаётся, "
+        "поэтому загрузку можно перезапускать"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--checkpoint',
+            help='Файл с номером последней загруженной строки '
+            '(по умолчанию <path>.checkpoint)',
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='Игнорировать сохранённую позицию и начать сначала',
+        )
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        checkpoint = Path(options['checkpoint'] or f'{path}.checkpoint')
+        done = 0
+        if checkpoint.exists() and not options['restart']:
+            done = int(checkpoint.read_text() or 0)
+            self.stdout.write(f"Продолжаем со строки {done + 1}")
+        created = skipped = 0
+        try:
+            file = open(path, encoding='utf-8')
+        except FileNotFoundError:
+            raise CommandError(f"Файл {path} не найден.")
+        with file:
+            lines = islice(file, done, None)
+            while True:
+                batch = list(islice(lines, options['batch_size']))
+                if not batch:
+                    break
+                items = [json.loads(line) for line in batch if line.strip()]
+                with transaction.atomic():
+                    batch_created = self.import_batch(items)
+                done += len(batch)
+                checkpoint.write_text(str(done))
+                created += batch_created
+                skipped += len(items) - batch_created
+                self.stdout.write(f"Строк обработано: {done}")
+        # bulk_create не отправляет сигналы, сбрасываем кэши справочников.
+        invalidate_tags()
+        bump_version('ingredients')
+        bump_version('recipes')
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Создано рецептов: {created}, пропущено: {skipped}"
+            )
+        )
+
+    def resolve_authors(self, items):
+        authors = {item['author']['email']: item['author'] for item in items}
+        User.objects.bulk_create(
+            [
+                User(
+                    email=email,
+                    username=data['username'],
+                    first_name=data['first_name'],
+                    last_name=data['last_name'],
+                    password='!',
+                )
+                for email, data in authors.items()
+            ],
+            ignore_conflicts=True,
+        )
+        return User.objects.in_bulk(authors, field_name='email')
+
+    def resolve_tags(self, items):
+        tags = {
+            tag['slug']: tag['name'] for item in items for tag in item['tags']
+        }
+        Tag.objects.bulk_create(
+            [Tag(slug=slug, name=name) for slug, name in tags.items()],
+            ignore_conflicts=True,
+        )
+        return Tag.objects.in_bulk(tags, field_name='slug')
+
+    def resolve_ingredients(self, items):
+        ingredients = {
+            ingredient['name']: ingredient['measurement_unit']
+            for item in items
+            for ingredient in item['ingredients']
+        }
+        Ingredient.objects.bulk_create(
+            [
+                Ingredient(name=name, measurement_unit=unit)
+                for name, unit in ingredients.items()
+            ],
+            ignore_conflicts=True,
+        )
+        return Ingredient.objects.in_bulk(ingredients, field_name='name')
+
+    def import_batch(self, items):
+        authors = self.resolve_authors(items)
+        tags = self.resolve_tags(items)
+        ingredients = self.resolve_ingredients(items)
+        existing = set(
+            Recipe.objects.filter(
+                author__in=authors.values(),
+                name__in={item['name'] for item in items},
+            ).values_list('author_id', 'name')
+        )
+        new_items = []
+        for item in items:
+            author = authors.get(item['author']['email'])
+            if author is None:
+                self.stderr.write(
+                    f"Автор {item['author']['email']} не создан, "
+                    f"рецепт «{item['name']}» пропущен."
+                )
+                continue
+            key = (author.id, item['name'])
+            if key in existing:
+                continue
+            existing.add(key)
+            new_items.append((author, item))
+        recipes = Recipe.objects.bulk_create(
+            [
+                Recipe(
+                    author=author,
+                    name=item['name'],
+                    text=item['text'],
+                    cooking_time=item['cooking_time'],
+                    image=item['image'],
+                )
+                for author, item in new_items
+            ]
+        )
+        Recipe.tags.through.objects.bulk_create(
+            [
+                Recipe.tags.through(recipe=recipe, tag=tags[tag['slug']])
+                for recipe, (_, item) in zip(recipes, new_items)
+                for tag in item['tags']
+                if tag['slug'] in tags
+            ],
+            ignore_conflicts=True,
+        )
+        RecipeIngredient.objects.bulk_create(
+            [
+                RecipeIngredient(
+                    recipe=recipe,
+                    ingredient=ingredients[ingredient['name']],
+                    amount=ingredient['amount'],
+                )
+                for recipe, (_, item) in zip(recipes, new_items)
+                for ingredient in item['ingredients']
+            ],
+            ignore_conflicts=True,
+        )
+        return len(recipes)
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from recipes.deletion import process_deletions
+
+
+class Command(BaseCommand):
+    help = (
+        "Удалить партиями пользователей и рецепты, поставленные в очередь "
+        "на удаление"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--retry-failed',
+            action='store_true',
+            help='Повторить задачи, завершившиеся ошибкой',
+        )
+
+    def handle(self, *args, **options):
+        processed = process_deletions(include_failed=options['retry_failed'])
+        self.stdout.write(
+            self.style.SUCCESS(f"Выполнено задач удаления: {processed}")
+        )
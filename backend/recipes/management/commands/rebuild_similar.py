@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from recipes.similarity import rebuild_similar
+
+
+class Command(BaseCommand):
+    help = "Пересчитать похожие рецепты для изменившихся рецептов"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full', action='store_true', help='Пересчитать все рецепты'
+        )
+
+    def handle(self, *args, **options):
+        processed = rebuild_similar(full=options['full'])
+        self.stdout.write(
+            self.style.SUCCESS(f"Пересчитано рецептов: {processed}")
+        )
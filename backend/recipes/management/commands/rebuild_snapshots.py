@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from recipes.models import Recipe
+from recipes.snapshots import build_snapshots
+
+
+class Command(BaseCommand):
+    help = "Построить снимки представления для всех рецептов"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        recipe_ids = list(Recipe.objects.values_list('id', flat=True))
+        for start in range(0, len(recipe_ids), batch_size):
+            build_snapshots(recipe_ids[start:start + batch_size])
+        self.stdout.write(
+            self.style.SUCCESS(f"Построено снимков: {len(recipe_ids)}")
+        )
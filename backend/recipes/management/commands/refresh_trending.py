@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from recipes.trending import refresh_trending
+
+
+class Command(BaseCommand):
+    help = "Обновить популярность рецептов по новым избранным и покупкам"
+
+    def handle(self, *args, **kwargs):
+        updated = refresh_trending()
+        self.stdout.write(
+            self.style.SUCCESS(f"Обновлена популярность рецептов: {updated}")
+        )
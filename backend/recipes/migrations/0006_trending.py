@@ -0,0 +1,43 @@
+# Generated by Django 4.2.16 on 2026-10-19 09:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_ingredient_trigram_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_favorite_id', models.BigIntegerField(default=0)),
+                ('last_cart_id', models.BigIntegerField(default=0)),
+                ('epoch', models.DateTimeField(verbose_name='Начало шкалы оценок')),
+                ('refreshed_at', models.DateTimeField(null=True, verbose_name='Последнее обновление')),
+            ],
+            options={
+                'verbose_name': 'Состояние расчёта популярности',
+                'verbose_name_plural': 'Состояние расчёта популярности',
+            },
+        ),
+        migrations.CreateModel(
+            name='TrendingScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('window', models.CharField(max_length=16, verbose_name='Окно')),
+                ('score', models.FloatField(default=0, verbose_name='Оценка')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trending_scores', to='recipes.recipe', verbose_name='Рецепт')),
+            ],
+            options={
+                'verbose_name': 'Популярность рецепта',
+                'verbose_name_plural': 'Популярность рецептов',
+                'indexes': [models.Index(fields=['window', '-score'], name='trending_window_score_idx')],
+                'unique_together': {('recipe', 'window')},
+            },
+        ),
+    ]
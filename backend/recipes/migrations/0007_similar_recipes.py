@@ -0,0 +1,40 @@
+# Generated by Django 4.2.16 on 2026-10-19 09:13
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_trending'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimilarityQueue',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to='recipes.recipe', verbose_name='Рецепт')),
+                ('queued_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Рецепт в очереди на пересчёт',
+                'verbose_name_plural': 'Очередь пересчёта похожих рецептов',
+            },
+        ),
+        migrations.CreateModel(
+            name='SimilarRecipe',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(verbose_name='Сходство')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_recipes', to='recipes.recipe', verbose_name='Рецепт')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='recipes.recipe', verbose_name='Похожий рецепт')),
+            ],
+            options={
+                'verbose_name': 'Похожий рецепт',
+                'verbose_name_plural': 'Похожие рецепты',
+                'indexes': [models.Index(fields=['recipe', '-score'], name='similar_recipe_score_idx')],
+                'unique_together': {('recipe', 'similar')},
+            },
+        ),
+    ]
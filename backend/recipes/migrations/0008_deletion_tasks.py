@@ -0,0 +1,37 @@
+# Generated by Django 4.2.16 on 2026-10-19 09:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_similar_recipes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeletionTask',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('user', 'Пользователь'), ('recipe', 'Рецепт')], max_length=16, verbose_name='Объект')),
+                ('object_id', models.PositiveBigIntegerField(verbose_name='id объекта')),
+                ('title', models.CharField(blank=True, max_length=200, verbose_name='Название')),
+                ('status', models.CharField(choices=[('pending', 'В очереди'), ('running', 'Выполняется'), ('done', 'Завершено'), ('failed', 'Ошибка')], default='pending', max_length=16, verbose_name='Статус')),
+                ('deleted', models.PositiveBigIntegerField(default=0, verbose_name='Удалено строк')),
+                ('error', models.TextField(blank=True, verbose_name='Ошибка')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создано')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Обновлено')),
+            ],
+            options={
+                'verbose_name': 'Задача удаления',
+                'verbose_name_plural': 'Задачи удаления',
+                'ordering': ['id'],
+            },
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='is_hidden',
+            field=models.BooleanField(default=False, verbose_name='Скрыт до удаления'),
+        ),
+    ]
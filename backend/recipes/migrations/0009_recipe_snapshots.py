@@ -0,0 +1,26 @@
+# Generated by Django 4.2.16 on 2026-10-19 09:28
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_deletion_tasks'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeSnapshot',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='snapshot', serialize=False, to='recipes.recipe', verbose_name='Рецепт')),
+                ('data', models.JSONField(verbose_name='Представление')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Обновлено')),
+            ],
+            options={
+                'verbose_name': 'Снимок рецепта',
+                'verbose_name_plural': 'Снимки рецептов',
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.16 on 2026-10-19 09:56
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_recipe_snapshots'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='ingredient',
+            name='ingredient_name_prefix_idx',
+        ),
+    ]
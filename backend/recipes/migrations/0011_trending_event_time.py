@@ -0,0 +1,72 @@
+from datetime import timedelta
+
+import django.utils.timezone
+from django.db import migrations, models
+
+# TRENDING_LATE_EVENT_SECONDS на момент миграции.
+LATE_EVENT_SECONDS = 60 * 10
+
+
+def start_time_window(apps, schema_editor):
+    """Переносит отметку по id на время.
+
+    Уже учтённые строки получают время перед окном перекрытия, чтобы не
+    войти в оценки повторно; время остальных — момент миграции.
+    """
+    db_alias = schema_editor.connection.alias
+    TrendingState = apps.get_model('recipes', 'TrendingState')
+    states = TrendingState.objects.using(db_alias).exclude(refreshed_at=None)
+    for state in states:
+        state.checked_until = state.refreshed_at
+        state.save(update_fields=['checked_until'])
+        counted_at = state.refreshed_at - timedelta(
+            seconds=LATE_EVENT_SECONDS + 1
+        )
+        for name, last_id in (
+            ('FavoriteRecipe', state.last_favorite_id),
+            ('ShoppingList', state.last_cart_id),
+        ):
+            apps.get_model('recipes', name).objects.using(db_alias).filter(
+                id__lte=last_id
+            ).update(created=counted_at)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_remove_duplicate_name_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='favoriterecipe',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, default=django.utils.timezone.now, verbose_name='Добавлен'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='shoppinglist',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, default=django.utils.timezone.now, verbose_name='Добавлен'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='trendingstate',
+            name='checked_until',
+            field=models.DateTimeField(null=True, verbose_name='События учтены до'),
+        ),
+        migrations.AddField(
+            model_name='trendingstate',
+            name='counted_ids',
+            field=models.JSONField(default=dict),
+        ),
+        migrations.RunPython(start_time_window, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='trendingstate',
+            name='last_cart_id',
+        ),
+        migrations.RemoveField(
+            model_name='trendingstate',
+            name='last_favorite_id',
+        ),
+    ]
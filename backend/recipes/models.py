@@ -1,6 +1,6 @@
 from django.contrib.auth import get_user_model
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import connections, models, router
 
 from utils.constants import (
     INGREDIENTS_ME_MAX_LENGTH,
@@ -52,6 +52,12 @@ class Tag(models.Model):
         return self.name
 
 
+class RecipeQuerySet(models.QuerySet):
+    def visible(self):
+        """Рецепты без отложенного удаления и с активным автором."""
+        return self.filter(is_hidden=False, author__is_active=True)
+
+
 class Recipe(models.Model):
     author = models.ForeignKey(
         User,
@@ -89,12 +95,20 @@ class Recipe(models.Model):
             ),
         ],
     )
+    is_hidden = models.BooleanField(
+        default=False, verbose_name='Скрыт до удаления'
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ['-id']
         default_related_name = 'recipes'
+        indexes = [
+            models.Index(fields=['author', '-id'], name='recipe_author_id_idx')
+        ]
 
     def __str__(self):
         return self.name
@@ -121,11 +135,88 @@ class RecipeIngredient(models.Model):
         verbose_name_plural = 'Ингредиенты в рецепте'
         unique_together = ('recipe', 'ingredient')
         default_related_name = 'recipe_ingredients'
+        indexes = [
+            # Покрывающий индекс для сборки списка покупок: соединение
+            # ShoppingList -> RecipeIngredient читается только из индекса.
+            models.Index(
+                fields=['recipe'],
+                include=['ingredient', 'amount'],
+                name='recipeingredient_cover_idx',
+            )
+        ]
 
     def __str__(self):
         return f"{self.ingredient.name} - {self.amount}"
 
 
+class UserRelationManager(models.Manager):
+    """Идемпотентные связи пользователя: каждая операция — один запрос.
+
+    ``add`` вставляет строку через ``INSERT ... SELECT ... ON CONFLICT DO
+    NOTHING``: проверка цели встроена в SELECT, повторная вставка не
+    падает на уникальности. ``remove`` — один DELETE. Оба возвращают,
+    изменилась ли строка. Сигналы модели не отправляются.
+    """
+
+    target_field = None
+    # SELECT (user_id, target_id) для доступной цели; параметры — id
+    # пользователя и цели, {user} и {target} — таблицы.
+    source = None
+    # Столбцы, которые source заполняет после user_id и id цели.
+    extra_columns = ()
+
+    def execute(self, sql, params):
+        connection = connections[router.db_for_write(self.model)]
+        meta = self.model._meta
+        sql = sql.format(
+            table=connection.ops.quote_name(meta.db_table),
+            user=connection.ops.quote_name(User._meta.db_table),
+            target=connection.ops.quote_name(
+                meta.get_field(self.target_field).related_model._meta.db_table
+            ),
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.rowcount > 0
+
+    def add(self, user_id, target_id):
+        columns = ', '.join(
+            ['user_id', f'{self.target_field}_id', *self.extra_columns]
+        )
+        return self.execute(
+            f'INSERT INTO {{table}} ({columns}) '
+            f'{self.source} ON CONFLICT DO NOTHING',
+            [user_id, target_id],
+        )
+
+    def remove(self, user_id, target_id):
+        return self.execute(
+            f'DELETE FROM {{table}} '
+            f'WHERE user_id = %s AND {self.target_field}_id = %s',
+            [user_id, target_id],
+        )
+
+
+class SubscriptionManager(UserRelationManager):
+    target_field = 'author'
+    source = (
+        'SELECT follower.id, author.id FROM {user} follower, {user} author '
+        'WHERE follower.id = %s AND author.id = %s '
+        'AND author.is_active AND author.id <> follower.id'
+    )
+
+
+class RecipeRelationManager(UserRelationManager):
+    target_field = 'recipe'
+    extra_columns = ('created',)
+    # Условия совпадают с RecipeQuerySet.visible().
+    source = (
+        'SELECT %s, recipe.id, CURRENT_TIMESTAMP FROM {target} recipe '
+        'JOIN {user} author ON author.id = recipe.author_id '
+        'WHERE recipe.id = %s AND NOT recipe.is_hidden AND author.is_active'
+    )
+
+
 class Subscription(models.Model):
     user = models.ForeignKey(
         User,
@@ -140,6 +231,8 @@ class Subscription(models.Model):
         verbose_name='Автор',
     )
 
+    objects = SubscriptionManager()
+
     class Meta:
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
@@ -162,6 +255,11 @@ class FavoriteRecipe(models.Model):
         related_name='favorited_by',
         verbose_name='Рецепт',
     )
+    created = models.DateTimeField(
+        auto_now_add=True, db_index=True, verbose_name='Добавлен'
+    )
+
+    objects = RecipeRelationManager()
 
     class Meta:
         verbose_name = 'Избранный рецепт'
@@ -185,6 +283,11 @@ class ShoppingList(models.Model):
         related_name='in_shopping_lists',
         verbose_name='Рецепт',
     )
+    created = models.DateTimeField(
+        auto_now_add=True, db_index=True, verbose_name='Добавлен'
+    )
+
+    objects = RecipeRelationManager()
 
     class Meta:
         verbose_name = 'Список покупок'
@@ -193,3 +296,199 @@ class ShoppingList(models.Model):
 
     def __str__(self):
         return f"{self.user} -> {self.recipe}"
+
+
+class FeedEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed',
+        verbose_name='Подписчик',
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Рецепт',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор',
+    )
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Лента подписок'
+        # Индекс (user, recipe) от unique_together обслуживает чтение ленты
+        # обратным сканированием по убыванию recipe_id.
+        unique_together = ('user', 'recipe')
+        indexes = [
+            models.Index(
+                fields=['user', 'author'], name='feed_user_author_idx'
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.user} <- {self.recipe}"
+
+
+class TrendingScore(models.Model):
+    """Популярность рецепта в окне с экспоненциальным затуханием.
+
+    Оценка хранится в масштабе ``TrendingState.epoch``: новые события
+    добавляются с весом 2 ** (t / период полураспада), поэтому старые
+    оценки не нужно пересчитывать при каждом обновлении.
+    """
+
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='trending_scores',
+        verbose_name='Рецепт',
+    )
+    window = models.CharField(max_length=16, verbose_name='Окно')
+    score = models.FloatField(default=0, verbose_name='Оценка')
+
+    class Meta:
+        verbose_name = 'Популярность рецепта'
+        verbose_name_plural = 'Популярность рецептов'
+        unique_together = ('recipe', 'window')
+        indexes = [
+            models.Index(
+                fields=['window', '-score'], name='trending_window_score_idx'
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.recipe} ({self.window}): {self.score:.2f}"
+
+
+class TrendingState(models.Model):
+    checked_until = models.DateTimeField(
+        null=True, verbose_name='События учтены до'
+    )
+    # id событий из окна перекрытия, которые уже вошли в оценки.
+    counted_ids = models.JSONField(default=dict)
+    epoch = models.DateTimeField(verbose_name='Начало шкалы оценок')
+    refreshed_at = models.DateTimeField(
+        null=True, verbose_name='Последнее обновление'
+    )
+
+    class Meta:
+        verbose_name = 'Состояние расчёта популярности'
+        verbose_name_plural = 'Состояние расчёта популярности'
+
+
+class SimilarRecipe(models.Model):
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar_recipes',
+        verbose_name='Рецепт',
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Похожий рецепт',
+    )
+    score = models.FloatField(verbose_name='Сходство')
+
+    class Meta:
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+        unique_together = ('recipe', 'similar')
+        indexes = [
+            models.Index(
+                fields=['recipe', '-score'], name='similar_recipe_score_idx'
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.recipe} ~ {self.similar}"
+
+
+class SimilarityQueue(models.Model):
+    """Рецепты, для которых нужно пересчитать похожие."""
+
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='+',
+        verbose_name='Рецепт',
+    )
+    queued_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Рецепт в очереди на пересчёт'
+        verbose_name_plural = 'Очередь пересчёта похожих рецептов'
+
+
+class RecipeSnapshot(models.Model):
+    """Готовое представление рецепта, не зависящее от пользователя."""
+
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='snapshot',
+        verbose_name='Рецепт',
+    )
+    data = models.JSONField(verbose_name='Представление')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Обновлено')
+
+    class Meta:
+        verbose_name = 'Снимок рецепта'
+        verbose_name_plural = 'Снимки рецептов'
+
+
+class DeletionTask(models.Model):
+    """Отложенное удаление пользователя или рецепта партиями."""
+
+    USER = 'user'
+    RECIPE = 'recipe'
+    KIND_CHOICES = ((USER, 'Пользователь'), (RECIPE, 'Рецепт'))
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Завершено'),
+        (FAILED, 'Ошибка'),
+    )
+
+    kind = models.CharField(
+        max_length=16, choices=KIND_CHOICES, verbose_name='Объект'
+    )
+    object_id = models.PositiveBigIntegerField(verbose_name='id объекта')
+    title = models.CharField(
+        max_length=RICIPE_NAME_MAX_LENGTH, blank=True, verbose_name='Название'
+    )
+    status = models.CharField(
+        max_length=16,
+        choices=STATUS_CHOICES,
+        default=PENDING,
+        verbose_name='Статус',
+    )
+    deleted = models.PositiveBigIntegerField(
+        default=0, verbose_name='Удалено строк'
+    )
+    error = models.TextField(blank=True, verbose_name='Ошибка')
+    created_at = models.DateTimeField(
+        auto_now_add=True, verbose_name='Создано'
+    )
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Обновлено')
+
+    class Meta:
+        verbose_name = 'Задача удаления'
+        verbose_name_plural = 'Задачи удаления'
+        ordering = ['id']
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.title or self.object_id}"
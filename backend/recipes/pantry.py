@@ -0,0 +1,150 @@
+"""Подбор рецептов по имеющимся продуктам.
+
+Инвертированный индекс ингредиент -> массив id рецептов хранится в
+памяти процесса. Изменённые рецепты после фиксации транзакции
+записываются в журнал в кэше, и каждый процесс при следующем запросе
+перечитывает из БД только их. Целиком индекс перестраивается, когда
+меняется версия 'recipes' (массовые изменения, импорт) или журнал
+нельзя применить: записи вытеснены или их слишком много. Запрос
+считает для каждого рецепта число найденных ингредиентов и сортирует
+по числу недостающих.
+"""
+import threading
+from array import array
+from collections import Counter, defaultdict
+
+from django.core.cache import cache
+
+from recipes.cache import bump_version, get_version
+from recipes.models import RecipeIngredient
+from utils import metrics
+from utils.constants import PANTRY_MAX_REPLAY, REFERENCE_CACHE_TIMEOUT
+
+
+def visible_pairs(**filters):
+    return (
+        RecipeIngredient.objects.filter(
+            recipe__is_hidden=False, recipe__author__is_active=True, **filters
+        )
+        .values_list('recipe_id', 'ingredient_id')
+        .iterator(chunk_size=10000)
+    )
+
+
+class PantryIndex:
+    def __init__(self, pairs):
+        postings = defaultdict(lambda: array('L'))
+        recipes = defaultdict(lambda: array('L'))
+        for recipe_id, ingredient_id in pairs:
+            postings[ingredient_id].append(recipe_id)
+            recipes[recipe_id].append(ingredient_id)
+        self.postings = dict(postings)
+        self.recipes = dict(recipes)
+
+    def update(self, recipe_ids, pairs):
+        """Заменяет ингредиенты рецептов ``recipe_ids`` на ``pairs``.
+
+        Массивы не меняются на месте, а подменяются новыми: запросы
+        других потоков продолжают читать прежние.
+        """
+        added = defaultdict(list)
+        for recipe_id, ingredient_id in pairs:
+            added[recipe_id].append(ingredient_id)
+        removed = defaultdict(set)
+        for recipe_id in recipe_ids:
+            for ingredient_id in self.recipes.pop(recipe_id, ()):
+                removed[ingredient_id].add(recipe_id)
+        appended = defaultdict(list)
+        for recipe_id, ingredient_ids in added.items():
+            self.recipes[recipe_id] = array('L', ingredient_ids)
+            for ingredient_id in ingredient_ids:
+                appended[ingredient_id].append(recipe_id)
+        for ingredient_id in removed.keys() | appended.keys():
+            posting = array(
+                'L',
+                (
+                    recipe_id
+                    for recipe_id in self.postings.get(ingredient_id, ())
+                    if recipe_id not in removed[ingredient_id]
+                ),
+            )
+            posting.extend(appended[ingredient_id])
+            if posting:
+                self.postings[ingredient_id] = posting
+            else:
+                self.postings.pop(ingredient_id, None)
+
+    def match(self, ingredient_ids):
+        """Список (recipe_id, недостающих, найденных) по релевантности."""
+        found = Counter()
+        for ingredient_id in set(ingredient_ids):
+            found.update(self.postings.get(ingredient_id, ()))
+        recipes = self.recipes
+        matches = [
+            (recipe_id, len(recipes.get(recipe_id, ())) - count, count)
+            for recipe_id, count in found.items()
+        ]
+        matches.sort(key=lambda item: (item[1], -item[2], -item[0]))
+        return matches
+
+
+def log_key(version):
+    return f'pantry:log:{version}'
+
+
+def record_changes(recipe_ids):
+    """Добавляет изменённые рецепты в журнал; вызывать после фиксации."""
+    key = log_key(get_version('recipes'))
+    try:
+        number = cache.incr(key)
+    except ValueError:
+        # Счётчик вытеснен: без журнала индексы перестроятся целиком.
+        bump_version('recipes')
+        return
+    cache.set(f'{key}:{number}', list(recipe_ids), REFERENCE_CACHE_TIMEOUT)
+
+
+_index = None
+_index_version = None
+_index_number = 0
+_lock = threading.Lock()
+
+
+def replay(key, number):
+    """Применяет к индексу записи журнала; False, если это невозможно."""
+    global _index_number
+    if number - _index_number > PANTRY_MAX_REPLAY:
+        return False
+    keys = [f'{key}:{n}' for n in range(_index_number + 1, number + 1)]
+    changes = cache.get_many(keys)
+    if len(changes) != len(keys):
+        return False
+    recipe_ids = set().union(*changes.values())
+    _index.update(recipe_ids, visible_pairs(recipe_id__in=recipe_ids))
+    _index_number = number
+    return True
+
+
+def get_index():
+    global _index, _index_version, _index_number
+    with _lock:
+        version = get_version('recipes')
+        key = log_key(version)
+        number = cache.get(key)
+        current = (
+            _index is not None
+            and _index_version == version
+            and number is not None
+            and number >= _index_number
+        )
+        if current and number > _index_number:
+            current = replay(key, number)
+        metrics.record_cache('pantry_index', current)
+        if not current:
+            cache.add(key, 0, REFERENCE_CACHE_TIMEOUT)
+            # Номер берётся до чтения БД: изменения, записанные во время
+            # построения, применятся повторно, а не потеряются.
+            _index_number = cache.get(key, 0)
+            _index = PantryIndex(visible_pairs())
+            _index_version = version
+        return _index
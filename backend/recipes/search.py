@@ -0,0 +1,151 @@
+"""Ранжированный поиск ингредиентов с допуском опечаток.
+
+Релевантность складывается из совпадения по префиксу, вхождения всех
+слов запроса и триграммного сходства. На PostgreSQL поиск выполняет
+pg_trgm с GIN-индексом, на остальных СУБД — n-граммный индекс в памяти
+процесса, который перестраивается при изменении справочника.
+"""
+import heapq
+import re
+from collections import Counter, defaultdict
+
+from django.contrib.postgres.lookups import TrigramSimilar, TrigramWordSimilar
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import connection
+from django.db.models import Case, F, FloatField, Lookup, Value, When
+
+from recipes.cache import get_version
+from recipes.models import Ingredient
+from utils import metrics
+from utils.constants import INGREDIENT_SEARCH_THRESHOLD
+
+PREFIX_BONUS = 2.0
+INFIX_BONUS = 1.0
+
+NON_WORD = re.compile(r'[^\w]+')
+
+
+def normalize(text):
+    return ' '.join(NON_WORD.sub(' ', text.lower().replace('ё', 'е')).split())
+
+
+def trigrams(text):
+    """Триграммы слов в том же виде, что строит pg_trgm."""
+    grams = set()
+    for word in text.split():
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class IngredientSearchIndex:
+    """Инвертированный индекс триграмм по названиям ингредиентов."""
+
+    def __init__(self, items):
+        self.names = {}
+        self.sizes = {}
+        self.postings = defaultdict(list)
+        for pk, name in items:
+            name = normalize(name)
+            grams = trigrams(name)
+            self.names[pk] = name
+            self.sizes[pk] = len(grams)
+            for gram in grams:
+                self.postings[gram].append(pk)
+
+    def search(self, query, limit):
+        query = normalize(query)
+        grams = trigrams(query)
+        if not grams:
+            return []
+        shared = Counter()
+        for gram in grams:
+            shared.update(self.postings.get(gram, ()))
+        words = query.split()
+        scored = []
+        for pk, common in shared.items():
+            name = self.names[pk]
+            # Отбор — по доле триграмм запроса, найденных в названии (как
+            # word_similarity), ранжирование — по сходству целых строк.
+            if common / len(grams) < INGREDIENT_SEARCH_THRESHOLD:
+                continue
+            similarity = common / (len(grams) + self.sizes[pk] - common)
+            infix = all(word in name for word in words)
+            score = similarity
+            if infix:
+                score += INFIX_BONUS
+            if name.startswith(query):
+                score += PREFIX_BONUS
+            scored.append((score, -len(name), pk))
+        return [pk for *_, pk in heapq.nlargest(limit, scored)]
+
+
+_index = None
+_index_version = None
+
+
+def get_index():
+    global _index, _index_version
+    version = get_version('ingredients')
+    rebuild = _index is None or _index_version != version
+    metrics.record_cache('ingredient_search_index', not rebuild)
+    if rebuild:
+        _index = IngredientSearchIndex(
+            Ingredient.objects.values_list('id', 'name').iterator()
+        )
+        _index_version = version
+    return _index
+
+
+class ILike(Lookup):
+    """``ILIKE`` по самому столбцу: его обслуживает индекс gin_trgm_ops,
+    а ``icontains`` Django строит через UPPER() и индекс не использует."""
+
+    lookup_name = 'ilike'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} ILIKE {rhs}', [*lhs_params, *rhs_params]
+
+
+def search_ingredients(queryset, query, limit):
+    """Возвращает не более ``limit`` ингредиентов по убыванию релевантности."""
+    if not normalize(query):
+        return queryset.none()
+    if connection.vendor == 'postgresql':
+        # В SQL уходит исходная строка: столбец не нормализован, а регистр
+        # и знаки препинания pg_trgm и ILIKE учитывают сами.
+        query = query.strip()
+        pattern = connection.ops.prep_for_like_query(query)
+        infix = ILike(F('name'), Value(f'%{pattern}%'))
+        return (
+            queryset.filter(
+                infix
+                | TrigramSimilar(F('name'), Value(query))
+                | TrigramWordSimilar(Value(query), F('name'))
+            )
+            .annotate(
+                rank=Case(
+                    When(
+                        ILike(F('name'), Value(f'{pattern}%')),
+                        then=Value(PREFIX_BONUS),
+                    ),
+                    default=Value(0.0),
+                    output_field=FloatField(),
+                )
+                + Case(
+                    When(infix, then=Value(INFIX_BONUS)),
+                    default=Value(0.0),
+                    output_field=FloatField(),
+                )
+                + TrigramSimilarity('name', query)
+            )
+            .order_by('-rank', 'name')[:limit]
+        )
+    ids = get_index().search(query, limit)
+    if not ids:
+        return queryset.none()
+    return queryset.filter(id__in=ids).order_by(
+        Case(*[When(id=pk, then=Value(pos)) for pos, pk in enumerate(ids)])
+    )
@@ -0,0 +1,27 @@
+"""Список покупок: ингредиенты рецептов из корзины с суммарным количеством."""
+from django.db.models import Sum
+
+from recipes.models import RecipeIngredient
+
+FILENAME = 'shopping_list.txt'
+
+
+def get_ingredients(user_id):
+    return (
+        RecipeIngredient.objects.filter(
+            recipe__in_shopping_lists__user_id=user_id
+        )
+        .values('ingredient__name', 'ingredient__measurement_unit')
+        .annotate(amount=Sum('amount'))
+        .order_by('ingredient__name', 'ingredient__measurement_unit')
+    )
+
+
+def render(ingredients):
+    return '\n'.join(
+        [
+            f"{row['ingredient__name']} — {row['amount']} "
+            f"{row['ingredient__measurement_unit']}"
+            for row in ingredients
+        ]
+    )
@@ -0,0 +1,151 @@
+from django.db import transaction
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+)
+from django.dispatch import Signal, receiver
+
+from recipes import feed, pantry, snapshots
+from recipes.cache import bump_version, invalidate_tags
+from recipes.models import (
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    SimilarityQueue,
+    Subscription,
+    Tag,
+    User,
+)
+
+# Рецепты изменились: сам рецепт, его ингредиенты или теги.
+# Аргументы: recipe_ids, deleted.
+recipe_changed = Signal()
+
+
+@receiver(post_save, sender=Recipe)
+def fan_out_recipe(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        feed.fan_out_recipe(instance)
+
+
+@receiver(post_save, sender=Subscription)
+def backfill_feed(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        feed.backfill_feed(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Subscription)
+def drop_author_from_feed(sender, instance, **kwargs):
+    feed.drop_author(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def reset_tag_cache(sender, **kwargs):
+    invalidate_tags()
+    # Повторно после фиксации: параллельное чтение могло успеть закэшировать
+    # старые данные под новой версией.
+    transaction.on_commit(invalidate_tags)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def reset_ingredient_version(sender, **kwargs):
+    bump_version('ingredients')
+    transaction.on_commit(lambda: bump_version('ingredients'))
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        recipe_changed.send(
+            sender=Recipe, recipe_ids=[instance.pk], deleted=False
+        )
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    recipe_changed.send(sender=Recipe, recipe_ids=[instance.pk], deleted=True)
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def recipe_ingredient_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        recipe_changed.send(
+            sender=Recipe, recipe_ids=[instance.recipe_id], deleted=False
+        )
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    recipe_ids = pk_set if reverse else [instance.pk]
+    if recipe_ids:
+        recipe_changed.send(
+            sender=Recipe, recipe_ids=list(recipe_ids), deleted=False
+        )
+
+
+@receiver(recipe_changed)
+def queue_similarity(sender, recipe_ids, deleted, **kwargs):
+    if deleted:
+        return
+
+    def queue():
+        # Ингредиенты удаляются раньше самого рецепта, поэтому ставим в
+        # очередь только рецепты, которые пережили транзакцию.
+        SimilarityQueue.objects.bulk_create(
+            [
+                SimilarityQueue(recipe_id=pk)
+                for pk in Recipe.objects.filter(pk__in=recipe_ids)
+                .order_by()
+                .values_list('pk', flat=True)
+            ],
+            update_conflicts=True,
+            unique_fields=['recipe'],
+            update_fields=['queued_at'],
+        )
+
+    transaction.on_commit(queue)
+
+
+@receiver(recipe_changed)
+def update_pantry_index(sender, recipe_ids, **kwargs):
+    recipe_ids = list(recipe_ids)
+    transaction.on_commit(lambda: pantry.record_changes(recipe_ids))
+
+
+@receiver(recipe_changed)
+def drop_recipe_snapshots(sender, recipe_ids, **kwargs):
+    recipe_ids = list(recipe_ids)
+    snapshots.invalidate(recipe_id__in=recipe_ids)
+    # Повторно после фиксации: параллельное чтение могло успеть сохранить
+    # снимок по старым данным.
+    transaction.on_commit(
+        lambda: snapshots.invalidate(recipe_id__in=recipe_ids)
+    )
+
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def drop_tag_snapshots(sender, instance, raw=False, **kwargs):
+    if not raw:
+        snapshots.invalidate(recipe__tags=instance)
+
+
+@receiver(post_save, sender=Ingredient)
+def drop_ingredient_snapshots(sender, instance, raw=False, **kwargs):
+    if not raw:
+        snapshots.invalidate(recipe__recipe_ingredients__ingredient=instance)
+
+
+@receiver(post_save, sender=User)
+def drop_author_snapshots(sender, instance, raw=False, **kwargs):
+    update_fields = kwargs.get('update_fields')
+    if raw or (update_fields and update_fields <= {'last_login', 'password'}):
+        return
+    snapshots.invalidate(recipe__author=instance)
@@ -0,0 +1,235 @@
+"""Предрасчёт похожих рецептов по пересечению ингредиентов и тегов.
+
+Рецепт — разреженный вектор ингредиентов с весами IDF: редкие
+ингредиенты сильнее говорят о сходстве, чем соль или вода. Сходство —
+взвешенный коэффициент Жаккара по ингредиентам плюс доля общих тегов.
+Пересчитываются только рецепты из ``SimilarityQueue``; кандидатов
+находим по инвертированному индексу ингредиент -> рецепты, пропуская
+слишком частые ингредиенты. Если редких совпадений мало (рецепт из
+одних частых ингредиентов, маленький каталог), к кандидатам добавляются
+последние рецепты с частыми ингредиентами рецепта. С каждого ингредиента
+берутся только последние рецепты, а из кандидатов партии остаются те,
+у которых больше всего совпадений.
+"""
+import heapq
+import math
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from recipes.models import (
+    Recipe,
+    RecipeIngredient,
+    SimilarityQueue,
+    SimilarRecipe,
+)
+from utils.constants import (
+    SIMILAR_RECIPES_LIMIT,
+    SIMILARITY_BATCH_SIZE,
+    SIMILARITY_FREQUENT_POSTINGS,
+    SIMILARITY_MAX_CANDIDATES,
+    SIMILARITY_MAX_DOCUMENT_FREQUENCY,
+    SIMILARITY_RARE_POSTINGS,
+    SIMILARITY_TAG_WEIGHT,
+)
+
+
+def group_pairs(pairs):
+    groups = defaultdict(set)
+    for key, value in pairs:
+        groups[key].add(value)
+    return groups
+
+
+def recent_postings(ingredient_ids, limit):
+    """Пары (ингредиент, рецепт), последние ``limit`` на ингредиент."""
+    return (
+        RecipeIngredient.objects.filter(ingredient_id__in=ingredient_ids)
+        .annotate(
+            position=Window(
+                RowNumber(),
+                partition_by=F('ingredient_id'),
+                order_by=F('recipe_id').desc(),
+            )
+        )
+        .filter(position__lte=limit)
+        .values_list('ingredient_id', 'recipe_id')
+    )
+
+
+class SimilarityIndex:
+    """Веса ингредиентов и векторы рецептов для одного пересчёта."""
+
+    def __init__(self):
+        total = Recipe.objects.count() or 1
+        frequencies = (
+            RecipeIngredient.objects.values('ingredient')
+            .annotate(recipes=Count('id'))
+            .values_list('ingredient', 'recipes')
+            .order_by()
+        )
+        self.weights = {}
+        self.rare = set()
+        for ingredient_id, recipes in frequencies:
+            self.weights[ingredient_id] = math.log(1 + total / recipes)
+            if recipes / total <= SIMILARITY_MAX_DOCUMENT_FREQUENCY:
+                self.rare.add(ingredient_id)
+
+    def load(self, recipe_ids):
+        self.ingredients = group_pairs(
+            RecipeIngredient.objects.filter(
+                recipe_id__in=recipe_ids
+            ).values_list('recipe_id', 'ingredient_id')
+        )
+        self.tags = group_pairs(
+            Recipe.tags.through.objects.filter(
+                recipe_id__in=recipe_ids
+            ).values_list('recipe_id', 'tag_id')
+        )
+        self.norms = {
+            recipe_id: sum(self.weights.get(pk, 0) for pk in ingredients)
+            for recipe_id, ingredients in self.ingredients.items()
+        }
+
+    def candidates(self, recipe_ids):
+        """Рецепты, у которых есть общий ингредиент с рецептами партии."""
+        ingredient_ids = set()
+        for recipe_id in recipe_ids:
+            ingredient_ids |= self.ingredients.get(recipe_id, set())
+        postings = group_pairs(
+            recent_postings(
+                ingredient_ids & self.rare, SIMILARITY_RARE_POSTINGS
+            )
+        )
+        overlap = Counter()
+        frequent = set()
+        for recipe_id in recipe_ids:
+            ingredients = self.ingredients.get(recipe_id, set())
+            found = Counter()
+            for pk in ingredients:
+                found.update(postings.get(pk, ()))
+            found.pop(recipe_id, None)
+            overlap.update(found)
+            if len(found) < SIMILAR_RECIPES_LIMIT:
+                frequent |= ingredients - self.rare
+        if frequent:
+            overlap.update(
+                recipe_id
+                for _, recipe_id in recent_postings(
+                    frequent, SIMILARITY_FREQUENT_POSTINGS
+                )
+            )
+        return {
+            recipe_id
+            for recipe_id, _ in overlap.most_common(SIMILARITY_MAX_CANDIDATES)
+        }
+
+    def score(self, first, second):
+        common = self.ingredients[first] & self.ingredients.get(second, set())
+        if not common:
+            return 0
+        shared = sum(self.weights.get(pk, 0) for pk in common)
+        union = self.norms[first] + self.norms[second] - shared
+        score = (1 - SIMILARITY_TAG_WEIGHT) * shared / union
+        first_tags = self.tags.get(first, set())
+        second_tags = self.tags.get(second, set())
+        if first_tags or second_tags:
+            score += (
+                SIMILARITY_TAG_WEIGHT
+                * len(first_tags & second_tags)
+                / len(first_tags | second_tags)
+            )
+        return score
+
+
+def top(scores):
+    return dict(
+        heapq.nlargest(
+            SIMILAR_RECIPES_LIMIT, scores.items(), key=lambda item: item[1]
+        )
+    )
+
+
+@transaction.atomic
+def rebuild_batch(index, recipe_ids):
+    """Пересчитывает списки рецептов партии и их место у соседей."""
+    index.load(recipe_ids)
+    candidates = index.candidates(recipe_ids)
+    index.load(candidates | set(recipe_ids))
+    SimilarRecipe.objects.filter(recipe_id__in=recipe_ids).delete()
+    SimilarRecipe.objects.filter(similar_id__in=recipe_ids).delete()
+
+    lists = {}
+    reverse = defaultdict(dict)
+    for recipe_id in recipe_ids:
+        if recipe_id not in index.ingredients:
+            continue
+        scores = {}
+        for candidate in candidates:
+            if candidate != recipe_id:
+                score = index.score(recipe_id, candidate)
+                if score:
+                    scores[candidate] = score
+                    reverse[candidate][recipe_id] = score
+        lists[recipe_id] = top(scores)
+
+    neighbours = set(reverse) - set(recipe_ids)
+    current = defaultdict(dict)
+    for row in SimilarRecipe.objects.filter(recipe_id__in=neighbours):
+        current[row.recipe_id][row.similar_id] = (row.pk, row.score)
+    dropped = []
+    for recipe_id in neighbours:
+        existing = current[recipe_id]
+        merged = top(
+            {
+                **{pk: score for pk, (_, score) in existing.items()},
+                **reverse[recipe_id],
+            }
+        )
+        dropped += [
+            row_id
+            for pk, (row_id, _) in existing.items()
+            if pk not in merged
+        ]
+        lists[recipe_id] = {
+            pk: score for pk, score in merged.items() if pk not in existing
+        }
+    SimilarRecipe.objects.filter(pk__in=dropped).delete()
+    SimilarRecipe.objects.bulk_create(
+        SimilarRecipe(recipe_id=recipe_id, similar_id=pk, score=score)
+        for recipe_id, scores in lists.items()
+        for pk, score in scores.items()
+    )
+
+
+def rebuild_similar(full=False):
+    """Обрабатывает очередь пересчёта; возвращает число рецептов."""
+    if full:
+        SimilarityQueue.objects.bulk_create(
+            (
+                SimilarityQueue(recipe_id=pk)
+                for pk in Recipe.objects.values_list('id', flat=True)
+            ),
+            batch_size=SIMILARITY_BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+    started = timezone.now()
+    index = SimilarityIndex()
+    processed = 0
+    while True:
+        recipe_ids = list(
+            SimilarityQueue.objects.filter(queued_at__lte=started)
+            .order_by('queued_at')
+            .values_list('recipe_id', flat=True)[:SIMILARITY_BATCH_SIZE]
+        )
+        if not recipe_ids:
+            return processed
+        rebuild_batch(index, recipe_ids)
+        # Рецепт, изменённый во время пересчёта, остаётся в очереди.
+        SimilarityQueue.objects.filter(
+            recipe_id__in=recipe_ids, queued_at__lte=started
+        ).delete()
+        processed += len(recipe_ids)
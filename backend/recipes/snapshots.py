@@ -0,0 +1,194 @@
+"""Снимки представления рецепта для чтения без JOIN и prefetch.
+
+В снимке лежит всё, что отдаёт API о рецепте, кроме флагов, зависящих
+от пользователя: ``is_favorited``, ``is_in_shopping_cart`` и
+``author.is_subscribed``. При изменении рецепта, его ингредиентов, тегов
+или профиля автора снимок удаляется и строится заново при следующем
+чтении; заполнить снимки заранее можно командой ``rebuild_snapshots``.
+
+Клиент может запросить только часть полей: тогда из снимков читаются
+лишь нужные ключи JSON, а флаги пользователя, которых нет в ответе,
+не запрашиваются вовсе.
+"""
+from django.db import router
+from django.db.models.fields.json import KeyTransform
+from django.utils import timezone
+
+from recipes.models import (
+    FavoriteRecipe,
+    Recipe,
+    RecipeSnapshot,
+    ShoppingList,
+    Subscription,
+)
+
+# Поля представления рецепта в порядке RecipeDetailSerializer.
+FIELDS = (
+    'id',
+    'name',
+    'image',
+    'cooking_time',
+    'tags',
+    'author',
+    'ingredients',
+    'is_favorited',
+    'is_in_shopping_cart',
+    'text',
+)
+# Вычисляются для пользователя, в снимке их нет.
+VIEWER_FIELDS = ('id', 'is_favorited', 'is_in_shopping_cart')
+
+
+def snapshot_data(recipe):
+    author = recipe.author
+    return {
+        'id': recipe.id,
+        'name': recipe.name,
+        'image': recipe.image.url if recipe.image else None,
+        'cooking_time': recipe.cooking_time,
+        'tags': [
+            {'id': tag.id, 'name': tag.name, 'slug': tag.slug}
+            for tag in recipe.tags.all()
+        ],
+        'author': {
+            'email': author.email,
+            'id': author.id,
+            'username': author.username,
+            'first_name': author.first_name,
+            'last_name': author.last_name,
+            'avatar': author.avatar.url if author.avatar else None,
+        },
+        'ingredients': [
+            {
+                'id': item.ingredient.id,
+                'name': item.ingredient.name,
+                'measurement_unit': item.ingredient.measurement_unit,
+                'amount': item.amount,
+            }
+            for item in recipe.recipe_ingredients.all()
+        ],
+        'text': recipe.text,
+    }
+
+
+def build_snapshots(recipe_ids):
+    """Строит и сохраняет снимки; возвращает словарь id -> данные.
+
+    Рецепты читаются из основной базы: снимок из отстающей реплики
+    сохранился бы поверх свежих данных и жил бы до следующего изменения.
+    """
+    recipes = (
+        Recipe.objects.using(router.db_for_write(Recipe))
+        .filter(id__in=recipe_ids)
+        .select_related('author')
+        .prefetch_related('tags', 'recipe_ingredients__ingredient')
+    )
+    now = timezone.now()
+    snapshots = [
+        RecipeSnapshot(
+            recipe_id=recipe.id, data=snapshot_data(recipe), updated_at=now
+        )
+        for recipe in recipes
+    ]
+    RecipeSnapshot.objects.bulk_create(
+        snapshots,
+        update_conflicts=True,
+        unique_fields=['recipe'],
+        update_fields=['data', 'updated_at'],
+    )
+    return {snapshot.recipe_id: snapshot.data for snapshot in snapshots}
+
+
+def get_snapshots(recipe_ids, keys=None):
+    """Снимки рецептов; ``keys`` — выбрать из JSON только эти ключи."""
+    queryset = RecipeSnapshot.objects.filter(recipe_id__in=recipe_ids)
+    if keys is None:
+        snapshots = dict(queryset.values_list('recipe_id', 'data'))
+    else:
+        keys = list(keys)
+        snapshots = {
+            recipe_id: dict(zip(keys, values))
+            for recipe_id, *values in queryset.values_list(
+                'recipe_id', *[KeyTransform(key, 'data') for key in keys]
+            )
+        }
+    missing = [pk for pk in recipe_ids if pk not in snapshots]
+    if missing:
+        for pk, data in build_snapshots(missing).items():
+            snapshots[pk] = (
+                data if keys is None else {key: data[key] for key in keys}
+            )
+    return snapshots
+
+
+def invalidate(**filters):
+    RecipeSnapshot.objects.filter(**filters).delete()
+
+
+def render_recipes(recipe_ids, request, fields=FIELDS):
+    """Представления рецептов в порядке ``recipe_ids`` для пользователя.
+
+    В ответ попадают только ``fields``; флаги пользователя выбираются
+    тремя запросами на всю страницу и только если они запрошены.
+    """
+    recipe_ids = list(recipe_ids)
+    fields = [field for field in FIELDS if field in fields]
+    snapshots = get_snapshots(
+        recipe_ids, [field for field in fields if field not in VIEWER_FIELDS]
+    )
+    user = request.user
+    favorited = in_cart = subscribed = set()
+    if user.is_authenticated:
+        if 'is_favorited' in fields:
+            favorited = set(
+                FavoriteRecipe.objects.filter(
+                    user=user, recipe_id__in=recipe_ids
+                ).values_list('recipe_id', flat=True)
+            )
+        if 'is_in_shopping_cart' in fields:
+            in_cart = set(
+                ShoppingList.objects.filter(
+                    user=user, recipe_id__in=recipe_ids
+                ).values_list('recipe_id', flat=True)
+            )
+        if 'author' in fields:
+            subscribed = set(
+                Subscription.objects.filter(
+                    user=user,
+                    author_id__in={
+                        data['author']['id'] for data in snapshots.values()
+                    },
+                ).values_list('author_id', flat=True)
+            )
+    results = []
+    for pk in recipe_ids:
+        data = snapshots.get(pk)
+        if data is None:
+            continue
+        item = {}
+        for field in fields:
+            if field == 'id':
+                item[field] = pk
+            elif field == 'image':
+                item[field] = data['image'] and request.build_absolute_uri(
+                    data['image']
+                )
+            elif field == 'author':
+                author = data['author']
+                item[field] = {
+                    'email': author['email'],
+                    'id': author['id'],
+                    'username': author['username'],
+                    'first_name': author['first_name'],
+                    'last_name': author['last_name'],
+                    'is_subscribed': author['id'] in subscribed,
+                    'avatar': author['avatar'],
+                }
+            elif field == 'is_favorited':
+                item[field] = pk in favorited
+            elif field == 'is_in_shopping_cart':
+                item[field] = pk in in_cart
+            else:
+                item[field] = data[field]
+        results.append(item)
+    return results
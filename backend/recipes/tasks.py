@@ -0,0 +1,16 @@
+"""Фоновые задачи рецептов; остальные объявлены в deletion.py и feed.py."""
+from jobs.queue import task
+from recipes import shopping_list
+from recipes.deletion import run_deletion  # noqa: F401
+from recipes.feed import backfill_followers  # noqa: F401
+
+
+@task('recipes.export_shopping_list')
+def export_shopping_list(user_id):
+    """Список покупок большой корзины, собранный в фоне."""
+    return {
+        'filename': shopping_list.FILENAME,
+        'content': shopping_list.render(
+            shopping_list.get_ingredients(user_id)
+        ),
+    }
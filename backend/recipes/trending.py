@@ -0,0 +1,133 @@
+"""Инкрементальный расчёт популярности рецептов.
+
+Каждое обновление читает только строки избранного и корзины, добавленные
+после прошлого запуска (с перекрытием для поздно зафиксированных).
+Затухание реализовано через общую шкалу: вес события растёт как
+2 ** (t / период полураспада), где t — время события, а когда показатель
+становится слишком большим, все оценки один раз перемасштабируются и
+шкала начинается заново.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from recipes.models import (
+    FavoriteRecipe,
+    ShoppingList,
+    TrendingScore,
+    TrendingState,
+)
+from utils.constants import (
+    TRENDING_BATCH_SIZE,
+    TRENDING_LATE_EVENT_SECONDS,
+    TRENDING_MIN_SCORE,
+    TRENDING_RESCALE_EXPONENT,
+)
+
+
+def get_state(now):
+    state = TrendingState.objects.select_for_update().first()
+    if state is None:
+        state = TrendingState.objects.create(epoch=now)
+    return state
+
+
+def new_events(model, state, now):
+    """Неучтённые события ``model``: пары (recipe_id, created).
+
+    Время ``created`` назначается до фиксации транзакции, и строка может
+    стать видна позже строк с большим временем. Поэтому окно начинается
+    на ``TRENDING_LATE_EVENT_SECONDS`` раньше прошлого обновления, а
+    строки, учтённые в перекрытии, пропускаются по id.
+    """
+    name = model._meta.model_name
+    counted = set(state.counted_ids.get(name, ()))
+    overlap = now - timedelta(seconds=TRENDING_LATE_EVENT_SECONDS)
+    rows = model.objects.filter(created__lte=now)
+    if state.checked_until is not None:
+        rows = rows.filter(
+            created__gte=state.checked_until
+            - timedelta(seconds=TRENDING_LATE_EVENT_SECONDS)
+        )
+    events = []
+    recent = []
+    for pk, recipe_id, created in rows.values_list(
+        'id', 'recipe_id', 'created'
+    ).iterator(chunk_size=TRENDING_BATCH_SIZE):
+        if created >= overlap:
+            recent.append(pk)
+        if pk not in counted:
+            events.append((recipe_id, created))
+    state.counted_ids[name] = recent
+    return events
+
+
+def rescale(state, now):
+    elapsed = (now - state.epoch).total_seconds()
+    exponents = {
+        window: elapsed / half_life
+        for window, half_life in settings.TRENDING_HALF_LIVES.items()
+    }
+    if max(exponents.values()) < TRENDING_RESCALE_EXPONENT:
+        return
+    for window, exponent in exponents.items():
+        TrendingScore.objects.filter(window=window).update(
+            score=F('score') * 2 ** -exponent
+        )
+    TrendingScore.objects.filter(score__lt=TRENDING_MIN_SCORE).delete()
+    state.epoch = now
+
+
+def add_scores(window, weights):
+    recipe_ids = list(weights)
+    for start in range(0, len(recipe_ids), TRENDING_BATCH_SIZE):
+        batch = recipe_ids[start:start + TRENDING_BATCH_SIZE]
+        existing = list(
+            TrendingScore.objects.filter(window=window, recipe_id__in=batch)
+        )
+        for score in existing:
+            score.score += weights[score.recipe_id]
+        TrendingScore.objects.bulk_update(existing, ['score'])
+        known = {score.recipe_id for score in existing}
+        TrendingScore.objects.bulk_create(
+            TrendingScore(
+                recipe_id=recipe_id,
+                window=window,
+                score=weights[recipe_id],
+            )
+            for recipe_id in batch
+            if recipe_id not in known
+            and weights[recipe_id] >= TRENDING_MIN_SCORE
+        )
+
+
+@transaction.atomic
+def refresh_trending(now=None):
+    """Учитывает новые события; возвращает число затронутых рецептов."""
+    now = now or timezone.now()
+    state = get_state(now)
+    rescale(state, now)
+    half_lives = settings.TRENDING_HALF_LIVES
+    weights = {window: defaultdict(float) for window in half_lives}
+    for model, weight in (
+        (FavoriteRecipe, settings.TRENDING_FAVORITE_WEIGHT),
+        (ShoppingList, settings.TRENDING_CART_WEIGHT),
+    ):
+        for recipe_id, created in new_events(model, state, now):
+            # Каждое событие затухает от своего времени, а не от времени
+            # обновления.
+            elapsed = (created - state.epoch).total_seconds()
+            for window, half_life in half_lives.items():
+                weights[window][recipe_id] += weight * 2 ** (
+                    elapsed / half_life
+                )
+    for window, window_weights in weights.items():
+        add_scores(window, window_weights)
+    state.checked_until = now
+    state.refreshed_at = now
+    state.save()
+    return len(set().union(*weights.values()))
@@ -1,7 +1,10 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.contrib.auth import get_user_model
 from django.contrib.auth.admin import UserAdmin as Admin
 
+from recipes.deletion import schedule_deletion
+from utils.pagination import EstimatedCountPaginator
+
 User = get_user_model()
 
 
@@ -9,3 +12,17 @@ User = get_user_model()
 class UserAdmin(Admin):
     list_display = ('email', 'username', 'first_name', 'last_name')
     search_fields = ('email', 'username', 'first_name', 'last_name')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = ('delete_in_background',)
+
+    @admin.action(description='Удалить в фоне')
+    def delete_in_background(self, request, queryset):
+        for user in queryset:
+            schedule_deletion(user)
+        self.message_user(
+            request,
+            f'Пользователей отключено и поставлено в очередь: '
+            f'{len(queryset)}',
+            messages.SUCCESS,
+        )
@@ -12,3 +12,58 @@ INGREDIENTS_ME_MAX_LENGTH = 50
 
 MIN_INGREDIENT_AMOUT = 1
 MAX_INGREDIENT_AMOUT = 5000
+
+RECIPE_BATCH_MAX_SIZE = 100
+RECIPE_BATCH_IMAGE_WORKERS = 4
+
+FEED_FANOUT_MAX_FOLLOWERS = 5000
+FEED_FANOUT_BATCH_SIZE = 1000
+FEED_BACKFILL_SIZE = 50
+FEED_POPULAR_CACHE_TIMEOUT = 600
+FEED_MAX_PAGE_SIZE = 50
+
+REFERENCE_CACHE_TIMEOUT = 60 * 60 * 24
+# Больше изменений из журнала выгоднее перестроить индекс подбора целиком.
+PANTRY_MAX_REPLAY = 1000
+REFERENCE_GZIP_LEVEL = 9
+REFERENCE_VERSION_PARAM = 'v'
+REFERENCE_IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+
+INGREDIENT_SEARCH_LIMIT = 10
+INGREDIENT_SEARCH_MAX_LIMIT = 50
+INGREDIENT_SEARCH_THRESHOLD = 0.3
+
+TRENDING_BATCH_SIZE = 1000
+TRENDING_RESCALE_EXPONENT = 64
+TRENDING_MIN_SCORE = 1e-3
+# Насколько позже своего времени событие может стать видно в БД.
+TRENDING_LATE_EVENT_SECONDS = 60 * 10
+
+SIMILAR_RECIPES_LIMIT = 10
+SIMILARITY_BATCH_SIZE = 200
+SIMILARITY_MAX_DOCUMENT_FREQUENCY = 0.2
+# Сколько последних рецептов ингредиента берётся в кандидаты.
+SIMILARITY_RARE_POSTINGS = 1000
+SIMILARITY_FREQUENT_POSTINGS = 200
+# Предел кандидатов на партию; остаются с наибольшим числом совпадений.
+SIMILARITY_MAX_CANDIDATES = 5000
+SIMILARITY_TAG_WEIGHT = 0.2
+
+DELETION_BATCH_SIZE = 500
+# Задача удаления без новых партий дольше этого считается брошенной.
+DELETION_LOCK_TIMEOUT = 60 * 10
+
+ESTIMATED_COUNT_MIN_ROWS = 10000
+EXACT_COUNT_LIMIT = 10000
+COUNT_CACHE_TIMEOUT = 300
+
+JOB_MAX_ATTEMPTS = 5
+JOB_RETRY_BASE_DELAY = 10
+JOB_RETRY_MAX_DELAY = 60 * 60
+JOB_LOCK_TIMEOUT = 60 * 10
+JOB_HEARTBEAT_INTERVAL = 30
+JOB_POLL_INTERVAL = 1.0
+JOB_NAME_MAX_LENGTH = 100
+SHOPPING_LIST_ASYNC_MIN_RECIPES = 100
+
+WARMUP_THREAD_TIMEOUT = 30
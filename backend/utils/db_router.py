@@ -0,0 +1,82 @@
+"""Чтение с реплик БД с привязкой к основной базе после записи.
+
+Безопасные запросы вьюх с ``ReplicaReadMixin`` читают данные с одной из
+реплик из ``settings.DATABASE_REPLICAS``. Пользователь, который только
+что что-то записал, ``REPLICA_PIN_SECONDS`` секунд читает с основной
+базы, чтобы видеть свои изменения несмотря на отставание реплик.
+"""
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.permissions import SAFE_METHODS
+
+PIN_COOKIE = 'db_primary_pin'
+
+_use_replica = ContextVar('use_replica', default=False)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            # Связанные объекты читаются из той же базы, что и объект.
+            return instance._state.db
+        if _use_replica.get() and settings.DATABASE_REPLICAS:
+            return random.choice(settings.DATABASE_REPLICAS)
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+
+def pin_key(user):
+    return f'db:pin:{user.pk}'
+
+
+def is_pinned(request):
+    if PIN_COOKIE in request.COOKIES:
+        return True
+    user = request.user
+    return user.is_authenticated and cache.get(pin_key(user)) is not None
+
+
+class PrimaryPinMiddleware:
+    """Привязывает пользователя к основной базе после успешной записи."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (
+            request.method not in SAFE_METHODS
+            and response.status_code < 400
+        ):
+            user = getattr(request, 'user', None)
+            if user is not None and user.is_authenticated:
+                cache.set(pin_key(user), True, settings.REPLICA_PIN_SECONDS)
+            response.set_cookie(
+                PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS
+            )
+        return response
+
+
+class ReplicaReadMixin:
+    """Направляет чтение безопасных запросов вьюхи на реплику."""
+
+    def dispatch(self, request, *args, **kwargs):
+        token = _use_replica.set(False)
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            _use_replica.reset(token)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in SAFE_METHODS and not is_pinned(request):
+            _use_replica.set(True)
@@ -0,0 +1,302 @@
+"""Метрики приложения в текстовом формате Prometheus.
+
+Каждый процесс копит счётчики и гистограммы в памяти и не чаще раза в
+``METRICS_FLUSH_INTERVAL`` секунд сохраняет их в свой файл
+``<pid>.json`` в ``METRICS_DIR`` (через временный файл и ``os.replace``,
+так что читатель всегда видит целый файл). ``/metrics`` суммирует файлы
+всех воркеров. Файл завершившегося воркера gunicorn переносится в общий
+архив хуком ``child_exit``, поэтому счётчики не убывают при перезапуске
+воркеров по ``max_requests``.
+"""
+import fcntl
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import ExitStack
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+ARCHIVE = 'archive.json'
+
+HELP = {
+    'foodgram_http_requests_total': 'Запросы по вьюхам, методам и статусам',
+    'foodgram_http_request_duration_seconds': 'Время ответа вьюхи',
+    'foodgram_db_queries_total': 'Запросы к БД по вьюхам',
+    'foodgram_db_query_duration_seconds_total': 'Время запросов к БД',
+    'foodgram_cache_requests_total': 'Обращения к кэшам',
+    'foodgram_throttle_rejections_total': 'Отказы ограничителя частоты',
+}
+
+
+def metric_key(name, labels):
+    return json.dumps([name, labels], ensure_ascii=False)
+
+
+class Registry:
+    """Метрики текущего процесса."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.pid = os.getpid()
+        self.started = time.time()
+        self.counters = defaultdict(float)
+        self.histograms = {}
+        self.flushed_at = 0
+
+    def check_fork(self):
+        # После fork процесс не должен дописывать счётчики родителя.
+        if self.pid != os.getpid():
+            self.reset()
+
+    def inc(self, name, labels, value=1):
+        with self.lock:
+            self.check_fork()
+            self.counters[metric_key(name, labels)] += value
+
+    def observe(self, name, labels, value):
+        with self.lock:
+            self.check_fork()
+            key = metric_key(name, labels)
+            histogram = self.histograms.setdefault(
+                key, [0] * (len(BUCKETS) + 1) + [0.0]
+            )
+            position = len(BUCKETS)
+            for index, bound in enumerate(BUCKETS):
+                if value <= bound:
+                    position = index
+                    break
+            histogram[position] += 1
+            histogram[-1] += value
+
+    def snapshot(self):
+        with self.lock:
+            self.check_fork()
+            return {
+                'pid': self.pid,
+                'started': self.started,
+                'counters': dict(self.counters),
+                'histograms': {
+                    key: list(value) for key, value in self.histograms.items()
+                },
+            }
+
+    def flush(self, force=False):
+        now = time.monotonic()
+        interval = settings.METRICS_FLUSH_INTERVAL
+        if not force and now - self.flushed_at < interval:
+            return
+        self.flushed_at = now
+        directory = Path(settings.METRICS_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        data = self.snapshot()
+        temporary = directory / f'.{data["pid"]}.{threading.get_ident()}.tmp'
+        temporary.write_text(json.dumps(data, ensure_ascii=False))
+        os.replace(temporary, directory / f'{data["pid"]}.json')
+
+
+registry = Registry()
+
+
+def inc(name, value=1, **labels):
+    registry.inc(name, labels, value)
+
+
+def record_cache(cache_name, hit):
+    inc(
+        'foodgram_cache_requests_total',
+        cache=cache_name,
+        result='hit' if hit else 'miss',
+    )
+
+
+def merge(total, data):
+    for key, value in data['counters'].items():
+        total['counters'][key] += value
+    for key, value in data['histograms'].items():
+        current = total['histograms'].get(key)
+        if current is None:
+            total['histograms'][key] = list(value)
+        else:
+            total['histograms'][key] = [a + b for a, b in zip(current, value)]
+
+
+def empty():
+    return {'counters': defaultdict(float), 'histograms': {}}
+
+
+def read(path):
+    try:
+        return json.loads(path.read_text())
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def archive_process(pid):
+    """Переносит метрики завершившегося процесса в архив (child_exit)."""
+    directory = Path(settings.METRICS_DIR)
+    path = directory / f'{pid}.json'
+    data = read(path)
+    if data is None:
+        return
+    with open(directory / '.lock', 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        archive = read(directory / ARCHIVE) or empty()
+        archive['counters'] = defaultdict(float, archive['counters'])
+        merge(archive, data)
+        temporary = directory / f'.{ARCHIVE}.tmp'
+        temporary.write_text(json.dumps(archive, ensure_ascii=False))
+        os.replace(temporary, directory / ARCHIVE)
+        path.unlink()
+
+
+def reset_storage():
+    """Очищает метрики прошлого запуска (on_starting)."""
+    directory = Path(settings.METRICS_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    for path in directory.glob('*.json'):
+        path.unlink()
+
+
+def collect():
+    """Суммарные метрики всех процессов и список живых воркеров."""
+    registry.flush(force=True)
+    directory = Path(settings.METRICS_DIR)
+    total = empty()
+    workers = []
+    for path in sorted(directory.glob('*.json')):
+        data = read(path)
+        if data is None:
+            continue
+        merge(total, data)
+        if path.name != ARCHIVE:
+            workers.append((data['pid'], data['started']))
+    return total, workers
+
+
+def format_labels(labels, **extra):
+    labels = {**labels, **extra}
+    if not labels:
+        return ''
+    escaped = (
+        str(value).replace('\\', '\\\\').replace('"', '\\"')
+        for value in labels.values()
+    )
+    return (
+        '{'
+        + ','.join(
+            f'{name}="{value}"' for name, value in zip(labels, escaped)
+        )
+        + '}'
+    )
+
+
+def format_value(value):
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def render():
+    total, workers = collect()
+    lines = []
+    by_name = defaultdict(list)
+    for key, value in total['counters'].items():
+        name, labels = json.loads(key)
+        by_name[name].append((labels, value))
+    for name in sorted(by_name):
+        lines.append(f'# HELP {name} {HELP.get(name, name)}')
+        lines.append(f'# TYPE {name} counter')
+        for labels, value in sorted(by_name[name], key=str):
+            labels = format_labels(labels)
+            lines.append(f'{name}{labels} {format_value(value)}')
+
+    hits = defaultdict(lambda: [0, 0])
+    for labels, value in by_name['foodgram_cache_requests_total']:
+        hits[labels['cache']][labels['result'] == 'hit'] += value
+    if hits:
+        lines.append('# TYPE foodgram_cache_hit_ratio gauge')
+        for cache_name, (misses, found) in sorted(hits.items()):
+            labels = format_labels({'cache': cache_name})
+            ratio = found / (found + misses)
+            lines.append(f'foodgram_cache_hit_ratio{labels} {ratio:g}')
+
+    histograms = defaultdict(list)
+    for key, value in total['histograms'].items():
+        name, labels = json.loads(key)
+        histograms[name].append((labels, value))
+    for name in sorted(histograms):
+        lines.append(f'# HELP {name} {HELP.get(name, name)}')
+        lines.append(f'# TYPE {name} histogram')
+        for labels, value in sorted(histograms[name], key=str):
+            cumulative = 0
+            for bound, count in zip(BUCKETS + ('+Inf',), value):
+                cumulative += count
+                lines.append(
+                    f'{name}_bucket{format_labels(labels, le=bound)}'
+                    f' {format_value(cumulative)}'
+                )
+            labels = format_labels(labels)
+            lines.append(f'{name}_sum{labels} {format_value(value[-1])}')
+            lines.append(f'{name}_count{labels} {format_value(cumulative)}')
+
+    lines.append('# TYPE foodgram_worker_info gauge')
+    for pid, _ in workers:
+        lines.append(f'foodgram_worker_info{format_labels({"pid": pid})} 1')
+    lines.append('# TYPE foodgram_worker_start_time_seconds gauge')
+    for pid, started in workers:
+        lines.append(
+            'foodgram_worker_start_time_seconds'
+            f'{format_labels({"pid": pid})} {started:.3f}'
+        )
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsMiddleware:
+    """Время ответа, статус и нагрузка на БД для каждой вьюхи."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = [0, 0.0]
+
+        def count_query(execute, sql, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                queries[0] += 1
+                queries[1] += time.perf_counter() - started
+
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(
+                    connections[alias].execute_wrapper(count_query)
+                )
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        match = request.resolver_match
+        view = match.view_name if match else 'unmatched'
+        inc(
+            'foodgram_http_requests_total',
+            view=view,
+            method=request.method,
+            status=response.status_code,
+        )
+        registry.observe(
+            'foodgram_http_request_duration_seconds', {'view': view}, elapsed
+        )
+        inc('foodgram_db_queries_total', queries[0], view=view)
+        inc('foodgram_db_query_duration_seconds_total', queries[1], view=view)
+        registry.flush()
+        return response
@@ -1,6 +1,83 @@
-from rest_framework.pagination import PageNumberPagination
+import hashlib
+from functools import partial
 
-from utils.constants import RECIPE_PER_PAGE
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from utils.constants import (
+    COUNT_CACHE_TIMEOUT,
+    ESTIMATED_COUNT_MIN_ROWS,
+    EXACT_COUNT_LIMIT,
+    FEED_MAX_PAGE_SIZE,
+    RECIPE_PER_PAGE,
+)
+
+
+def estimate_table_rows(model, using='default'):
+    """Число строк таблицы по статистике PostgreSQL или None."""
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+            [model._meta.db_table],
+        )
+        row = cursor.fetchone()
+    # До первого ANALYZE reltuples равен -1.
+    if row is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+def count_cache_key(queryset):
+    sql, params = queryset.query.sql_with_params()
+    digest = hashlib.md5(f'{queryset.db}:{sql}:{params!r}'.encode())
+    return f'pagination:count:{digest.hexdigest()}'
+
+
+class EstimatedCountPaginator(Paginator):
+    """Число объектов без полного COUNT(*) по большой таблице.
+
+    Если выборка совпадает с таблицей (``estimate``; по умолчанию — нет
+    условий WHERE), берётся статистика PostgreSQL. Иначе строки
+    считаются точно до ``EXACT_COUNT_LIMIT``, а число для выборки больше
+    этого считается полностью раз в ``COUNT_CACHE_TIMEOUT`` секунд.
+    """
+
+    def __init__(self, object_list, per_page, *args, estimate=None, **kwargs):
+        super().__init__(object_list, per_page, *args, **kwargs)
+        self.estimate = estimate
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not isinstance(queryset, QuerySet):
+            return super().count
+        queryset = queryset.order_by()
+        estimate = self.estimate
+        if estimate is None:
+            estimate = not queryset.query.where
+        if estimate:
+            rows = estimate_table_rows(queryset.model, queryset.db)
+            if rows is not None and rows >= ESTIMATED_COUNT_MIN_ROWS:
+                return rows
+        key = count_cache_key(queryset)
+        count = cache.get(key)
+        if count is not None:
+            return count
+        count = queryset[:EXACT_COUNT_LIMIT + 1].count()
+        if count > EXACT_COUNT_LIMIT:
+            count = queryset.count()
+            cache.set(key, count, COUNT_CACHE_TIMEOUT)
+        return count
 
 
 class CustomPageNumberPagination(PageNumberPagination):
@@ -8,6 +85,82 @@ class CustomPageNumberPagination(PageNumberPagination):
     page_size_query_param = 'limit'
 
 
+class EstimatedCountPagination(CustomPageNumberPagination):
+    """Постраничный вывод с приблизительным ``count`` для больших списков.
+
+    Оценка применяется только к действию ``list`` без параметров фильтра:
+    его выборка совпадает с таблицей с точностью до скрытых строк.
+    Параметры, меняющие только вид ответа, фильтром не считаются.
+    """
+
+    representation_params = ('fields', 'omit')
+
+    def is_filtered(self, request):
+        return bool(
+            set(request.query_params)
+            - {self.page_query_param, self.page_size_query_param}
+            - set(self.representation_params)
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.django_paginator_class = partial(
+            EstimatedCountPaginator,
+            estimate=getattr(view, 'action', None) == 'list'
+            and not self.is_filtered(request),
+        )
+        return super().paginate_queryset(queryset, request, view)
+
+
+class IdCursorPagination(BasePagination):
+    """Курсорная пагинация по убыванию id.
+
+    Курсор — id последнего элемента страницы, поэтому следующая страница
+    читается одним сканированием индекса без OFFSET.
+    """
+
+    page_size = RECIPE_PER_PAGE
+    page_size_query_param = 'limit'
+    max_page_size = FEED_MAX_PAGE_SIZE
+    cursor_query_param = 'cursor'
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_cursor(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor is None:
+            return None
+        if not cursor.isdigit():
+            raise NotFound('Неверный курсор.')
+        return int(cursor)
+
+    def paginate_ids(self, request, fetch_ids):
+        """Возвращает id страницы; ``fetch_ids(before, limit)`` — источник."""
+        self.request = request
+        limit = self.get_page_size(request)
+        ids = fetch_ids(self.get_cursor(request), limit + 1)
+        self.next_cursor = ids[limit - 1] if len(ids) > limit else None
+        return ids[:limit]
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.next_cursor,
+        )
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'results': data})
+
+
 # class SubscriptionPagination(PageNumberPagination):
 #     def get_page_size(self, request):
 #         try:
@@ -0,0 +1,460 @@
+"""Кэш Django в общей памяти для воркеров одного хоста.
+
+Данные лежат в файле, отображённом в память (по умолчанию в /dev/shm),
+поэтому все процессы видят одни и те же значения — в отличие от
+``locmem``, где у каждого воркера своя копия. Файл разбит на классы
+размеров ``SLOT_SIZES``; каждый класс — множественно-ассоциативная
+таблица: по хэшу ключ попадает в набор из ``WAYS`` слотов, а внутри
+набора вытесняется просроченный или дольше всех не читанный слот (LRU).
+Значение, не влезающее в самый большой слот, не кэшируется.
+
+Запись в набор идёт под его блокировкой: ``fcntl.lockf`` на байт файла
+между процессами и ``threading.Lock`` между потоками; ``store`` берёт
+наборы ключа во всех классах размеров сразу. Чтение блокировок не
+берёт: у каждого слота счётчик-seqlock, на время записи нечётный.
+Писатель выставляет чётное значение последним, после заголовка и
+данных; читатель читает счётчик отдельно до них и сверяет после,
+а при изменении повторяет.
+
+Параметры (``OPTIONS``): ``MAX_SIZE`` — размер файла в байтах,
+``SLOT_SIZES`` — размеры слотов, ``WAYS`` — слотов в наборе. Если файл
+создан с другими параметрами, он заменяется новым; процессы со старой
+конфигурацией продолжают работать со своей копией до перезапуска.
+"""
+import fcntl
+import hashlib
+import mmap
+import os
+import pickle
+import struct
+import threading
+import time
+from contextlib import ExitStack
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+MAGIC = b'FGSHMC01'
+HEADER = struct.Struct('<8s32s')
+# seq, хэш ключа, срок жизни, последнее чтение, длины ключа и значения.
+SLOT = struct.Struct('<QQddII')
+SEQ = struct.Struct('<Q')
+# Заголовок слота без seq: seq публикуется отдельной последней записью.
+BODY = struct.Struct('<QddII')
+USED = struct.Struct('<d')
+USED_OFFSET = 24
+EMPTY = 0
+READ_RETRIES = 8
+THREAD_LOCKS = 64
+
+DEFAULT_MAX_SIZE = 32 * 1024 * 1024
+DEFAULT_SLOT_SIZES = (512, 4096, 65536)
+DEFAULT_WAYS = 8
+
+_tables = {}
+_tables_lock = threading.Lock()
+
+
+def key_hash(key):
+    digest = hashlib.blake2b(key, digest_size=8).digest()
+    return int.from_bytes(digest, 'little') or 1
+
+
+class SizeClass:
+    def __init__(self, slot_size, ways, sets, offset, first_set):
+        self.slot_size = slot_size
+        self.set_size = ways * (SLOT.size + slot_size)
+        self.sets = sets
+        self.offset = offset
+        self.first_set = first_set
+
+    def set_offset(self, index):
+        return self.offset + index * self.set_size
+
+
+class Table:
+    """Отображённый в память файл с таблицами всех классов размеров."""
+
+    def __init__(self, path, max_size, slot_sizes, ways):
+        self.path = path
+        self.ways = ways
+        self.classes = []
+        offset = HEADER.size
+        first_set = 0
+        budget = max_size // len(slot_sizes)
+        for slot_size in sorted(slot_sizes):
+            sets = max(1, budget // (ways * (SLOT.size + slot_size)))
+            size_class = SizeClass(slot_size, ways, sets, offset, first_set)
+            self.classes.append(size_class)
+            offset += sets * size_class.set_size
+            first_set += sets
+        self.size = offset
+        self.signature = hashlib.sha256(
+            repr(
+                [(item.slot_size, item.sets) for item in self.classes] + [ways]
+            ).encode()
+        ).digest()
+        self.thread_locks = [threading.Lock() for _ in range(THREAD_LOCKS)]
+        self.fd, self.map = self.open()
+
+    def open(self):
+        while True:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            fcntl.lockf(fd, fcntl.LOCK_EX, 1, 0)
+            try:
+                ready = self.prepare(fd)
+            finally:
+                fcntl.lockf(fd, fcntl.LOCK_UN, 1, 0)
+            if ready:
+                return fd, mmap.mmap(fd, self.size)
+            os.close(fd)
+
+    def prepare(self, fd):
+        """Размечает новый файл; False — файл заменён, открыть заново."""
+        try:
+            if os.stat(self.path).st_ino != os.fstat(fd).st_ino:
+                return False
+        except FileNotFoundError:
+            return False
+        size = os.fstat(fd).st_size
+        header = HEADER.pack(MAGIC, self.signature)
+        if size == 0:
+            os.ftruncate(fd, self.size)
+            os.pwrite(fd, header, 0)
+        elif size != self.size or os.pread(fd, HEADER.size, 0) != header:
+            os.unlink(self.path)
+            return False
+        return True
+
+    def size_class(self, length):
+        for size_class in self.classes:
+            if length <= size_class.slot_size:
+                return size_class
+        return None
+
+    def lock(self, size_class, index):
+        return SetLock(self, [size_class.first_set + index])
+
+    def key_lock(self, hash_value):
+        """Блокировка наборов ключа во всех классах размеров."""
+        return SetLock(
+            self,
+            [
+                size_class.first_set + hash_value % size_class.sets
+                for size_class in self.classes
+            ],
+        )
+
+    def slot_offsets(self, size_class, index, way):
+        base = size_class.set_offset(index)
+        return (
+            base + way * SLOT.size,
+            base + self.ways * SLOT.size + way * size_class.slot_size,
+        )
+
+    def read(self, size_class, hash_value, key, now):
+        """Значение ключа без блокировок или None."""
+        index = hash_value % size_class.sets
+        for way in range(self.ways):
+            header_offset, data_offset = self.slot_offsets(
+                size_class, index, way
+            )
+            for _ in range(READ_RETRIES):
+                seq = SEQ.unpack_from(self.map, header_offset)[0]
+                if seq & 1:
+                    continue
+                slot_hash, expires, _, key_length, value_length = (
+                    BODY.unpack_from(self.map, header_offset + SEQ.size)
+                )
+                if slot_hash != hash_value:
+                    break
+                data = self.map[
+                    data_offset:data_offset + key_length + value_length
+                ]
+                if SEQ.unpack_from(self.map, header_offset)[0] != seq:
+                    continue
+                if data[:key_length] != key:
+                    break
+                if expires and expires <= now:
+                    return None
+                USED.pack_into(self.map, header_offset + USED_OFFSET, now)
+                return data[key_length:]
+        return None
+
+    def headers(self, size_class, index):
+        base = size_class.set_offset(index)
+        return list(
+            SLOT.iter_unpack(self.map[base:base + self.ways * SLOT.size])
+        )
+
+    def find(self, size_class, index, hash_value, key):
+        """Слот ключа и заголовки набора; под блокировкой набора."""
+        slots = self.headers(size_class, index)
+        for way, slot in enumerate(slots):
+            if slot[1] != hash_value:
+                continue
+            _, data_offset = self.slot_offsets(size_class, index, way)
+            if self.map[data_offset:data_offset + slot[4]] == key:
+                return way, slots
+        return None, slots
+
+    def victim(self, slots, now):
+        oldest_way, oldest_used = 0, None
+        for way, (_, slot_hash, expires, used, _, _) in enumerate(slots):
+            if slot_hash == EMPTY or (expires and expires <= now):
+                return way
+            if oldest_used is None or used < oldest_used:
+                oldest_way, oldest_used = way, used
+        return oldest_way
+
+    def write_slot(
+        self, size_class, index, way, hash_value, key, value, expires
+    ):
+        header_offset, data_offset = self.slot_offsets(size_class, index, way)
+        seq = SEQ.unpack_from(self.map, header_offset)[0]
+        SEQ.pack_into(self.map, header_offset, seq + 1)
+        if hash_value != EMPTY:
+            self.map[data_offset:data_offset + len(key) + len(value)] = (
+                key + value
+            )
+        BODY.pack_into(
+            self.map,
+            header_offset + SEQ.size,
+            hash_value,
+            expires,
+            time.time(),
+            len(key),
+            len(value),
+        )
+        SEQ.pack_into(self.map, header_offset, seq + 2)
+
+    def store(self, key, value, expires, only_new=False):
+        """Записывает значение; False, если ``only_new`` и ключ уже есть."""
+        hash_value = key_hash(key)
+        target = self.size_class(len(key) + len(value))
+        now = time.time()
+        with self.key_lock(hash_value):
+            found = {}
+            for size_class in self.classes:
+                index = hash_value % size_class.sets
+                way, slots = self.find(size_class, index, hash_value, key)
+                if way is not None:
+                    found[size_class] = (index, way, slots[way][2])
+            if only_new and any(
+                not expires_at or expires_at > now
+                for _, _, expires_at in found.values()
+            ):
+                return False
+            # Копия из другого класса размеров затенила бы новое значение.
+            for size_class, (index, way, _) in found.items():
+                if size_class is not target:
+                    self.write_slot(
+                        size_class, index, way, EMPTY, b'', b'', 0.0
+                    )
+            if target is None:
+                return not only_new
+            if target in found:
+                index, way, _ = found[target]
+            else:
+                index = hash_value % target.sets
+                way = self.victim(self.headers(target, index), now)
+            self.write_slot(
+                target, index, way, hash_value, key, value, expires
+            )
+        return True
+
+    def remove_from(self, size_class, hash_value, key):
+        index = hash_value % size_class.sets
+        with self.lock(size_class, index):
+            way, _ = self.find(size_class, index, hash_value, key)
+            if way is None:
+                return False
+            self.write_slot(size_class, index, way, EMPTY, b'', b'', 0.0)
+            return True
+
+    def remove(self, key):
+        hash_value = key_hash(key)
+        removed = False
+        for size_class in self.classes:
+            removed |= self.remove_from(size_class, hash_value, key)
+        return removed
+
+    def get(self, key):
+        hash_value = key_hash(key)
+        now = time.time()
+        for size_class in self.classes:
+            value = self.read(size_class, hash_value, key, now)
+            if value is not None:
+                return value
+        return None
+
+    def update(self, key, function):
+        """Атомарно заменяет значение результатом ``function(value)``.
+
+        Возвращает новое значение или None, если ключа нет; результат,
+        не влезающий в тот же слот, записывается обычным ``store``.
+        """
+        hash_value = key_hash(key)
+        now = time.time()
+        for size_class in self.classes:
+            index = hash_value % size_class.sets
+            with self.lock(size_class, index):
+                way, slots = self.find(size_class, index, hash_value, key)
+                if way is None:
+                    continue
+                _, _, expires, _, key_length, value_length = slots[way]
+                if expires and expires <= now:
+                    return None
+                _, data_offset = self.slot_offsets(size_class, index, way)
+                start = data_offset + key_length
+                value = function(self.map[start:start + value_length])
+                if key_length + len(value) <= size_class.slot_size:
+                    self.write_slot(
+                        size_class, index, way, hash_value, key, value, expires
+                    )
+                    return value
+            # Новое значение не влезло в слот прежнего класса.
+            self.store(key, value, expires)
+            return value
+        return None
+
+    def clear(self):
+        for size_class in self.classes:
+            for index in range(size_class.sets):
+                with self.lock(size_class, index):
+                    for way in range(self.ways):
+                        header_offset, _ = self.slot_offsets(
+                            size_class, index, way
+                        )
+                        if SLOT.unpack_from(self.map, header_offset)[1]:
+                            self.write_slot(
+                                size_class, index, way, EMPTY, b'', b'', 0.0
+                            )
+
+
+class SetLock:
+    """Блокировка наборов с номерами ``numbers`` между потоками и процессами.
+
+    Блокировки берутся по возрастанию номеров, поэтому одновременные
+    захваты нескольких наборов не приводят к взаимной блокировке.
+    """
+
+    def __init__(self, table, numbers):
+        self.fd = table.fd
+        stripes = sorted({number % THREAD_LOCKS for number in numbers})
+        self.thread_locks = [table.thread_locks[i] for i in stripes]
+        self.offsets = sorted({number + 1 for number in numbers})
+
+    def __enter__(self):
+        with ExitStack() as stack:
+            for thread_lock in self.thread_locks:
+                thread_lock.acquire()
+                stack.callback(thread_lock.release)
+            for offset in self.offsets:
+                fcntl.lockf(self.fd, fcntl.LOCK_EX, 1, offset)
+                stack.callback(fcntl.lockf, self.fd, fcntl.LOCK_UN, 1, offset)
+            self.stack = stack.pop_all()
+
+    def __exit__(self, *exc_info):
+        self.stack.close()
+
+
+def get_table(path, max_size, slot_sizes, ways):
+    # Экземпляры бэкенда создаются на каждый поток, таблица — одна
+    # на процесс, чтобы потоки делили блокировки.
+    config = (path, max_size, tuple(slot_sizes), ways)
+    table = _tables.get(config)
+    if table is None:
+        with _tables_lock:
+            table = _tables.get(config)
+            if table is None:
+                table = _tables[config] = Table(*config)
+    return table
+
+
+class SharedMemoryCache(BaseCache):
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._config = (
+            location,
+            int(options.get('MAX_SIZE', DEFAULT_MAX_SIZE)),
+            tuple(options.get('SLOT_SIZES', DEFAULT_SLOT_SIZES)),
+            int(options.get('WAYS', DEFAULT_WAYS)),
+        )
+
+    @property
+    def _table(self):
+        return get_table(*self._config)
+
+    def _expires(self, timeout):
+        """Момент истечения; 0.0 — бессрочно, None — уже истёк."""
+        expires = self.get_backend_timeout(timeout)
+        if expires is None:
+            return 0.0
+        return expires if expires > time.time() else None
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        expires = self._expires(timeout)
+        if expires is None:
+            return False
+        return self._table.store(
+            key.encode(),
+            pickle.dumps(value, self.pickle_protocol),
+            expires,
+            only_new=True,
+        )
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        value = self._table.get(key.encode())
+        if value is None:
+            return default
+        return pickle.loads(value)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        expires = self._expires(timeout)
+        if expires is None:
+            self._table.remove(key.encode())
+            return
+        self._table.store(
+            key.encode(), pickle.dumps(value, self.pickle_protocol), expires
+        )
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        value = self._table.get(key.encode())
+        if value is None:
+            return False
+        expires = self._expires(timeout)
+        if expires is None:
+            self._table.remove(key.encode())
+        else:
+            self._table.store(key.encode(), value, expires)
+        return True
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        result = []
+
+        def increment(value):
+            result.append(pickle.loads(value) + delta)
+            return pickle.dumps(result[0], self.pickle_protocol)
+
+        if self._table.update(key.encode(), increment) is None:
+            raise ValueError("Key '%s' not found" % key)
+        return result[0]
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._table.remove(key.encode())
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._table.get(key.encode()) is not None
+
+    def clear(self):
+        self._table.clear()
@@ -0,0 +1,61 @@
+"""Хранилище медиа с адресацией по содержимому.
+
+Файл сохраняется под именем ``<upload_to>/<ab>/<sha256><ext>``, где ab —
+первые два символа хеша. Повторная загрузка той же картинки не создаёт
+новый файл, а имя никогда не указывает на другое содержимое, поэтому
+такие файлы можно отдавать с бессрочным кэшированием.
+
+Один файл может принадлежать нескольким объектам, поэтому ``delete`` их
+не удаляет: неиспользуемые файлы убирает команда ``gc_media``.
+"""
+import hashlib
+import os
+import posixpath
+import re
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+HASHED_NAME = re.compile(r'(^|/)[0-9a-f]{2}/[0-9a-f]{64}(\.\w+)?$')
+
+
+def is_hashed(name):
+    return bool(HASHED_NAME.search(name))
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    def content_name(self, name, content):
+        digest = hashlib.sha256()
+        content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        digest = digest.hexdigest()
+        extension = posixpath.splitext(name)[1].lower()
+        return posixpath.join(
+            posixpath.dirname(name), digest[:2], digest + extension
+        )
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.content_name(name, content)
+        if self.exists(name):
+            try:
+                # Свежий mtime: gc_media не удалит старый файл, ссылка на
+                # который появилась уже после того, как он собрал ссылки.
+                os.utime(self.path(name))
+                return name
+            except FileNotFoundError:
+                pass
+        return self._save(name, content)
+
+    def delete(self, name):
+        if not is_hashed(name):
+            super().delete(name)
+
+    def purge(self, name):
+        """Удаляет файл независимо от адресации по содержимому."""
+        super().delete(name)
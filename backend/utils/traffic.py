@@ -0,0 +1,108 @@
+"""Запись обезличенного трафика для последующего воспроизведения.
+
+Включается переменной ``TRAFFIC_RECORDING_PATH``: в файл JSON Lines
+пишутся метод, путь, параметры запроса, структура тела (типы и длины
+строк вместо значений), id пользователя, статус и время ответа.
+Заголовки не записываются, значения чувствительных параметров заменяются.
+Воспроизводит запись команда ``replay_traffic``.
+"""
+import json
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+SENSITIVE = {'password', 'new_password', 'current_password', 'token', 'email'}
+SKIP_PREFIXES = ('/metrics', '/admin/', '/static/', '/media/')
+MASK = '***'
+
+_lock = threading.Lock()
+
+
+def shape(value):
+    """Структура значения без самих данных."""
+    if isinstance(value, dict):
+        return {
+            key: MASK if key in SENSITIVE else shape(item)
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [shape(item) for item in value]
+    if isinstance(value, str):
+        return f'str:{len(value)}'
+    if value is None:
+        return 'null'
+    return type(value).__name__
+
+
+def synthesize(value):
+    """Тело запроса той же структуры, что и записанное."""
+    if isinstance(value, dict):
+        return {key: synthesize(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [synthesize(item) for item in value]
+    if value == MASK:
+        return 'x'
+    if value.startswith('str:'):
+        return 'x' * int(value[4:])
+    return {'int': 1, 'float': 1.0, 'bool': True}.get(value)
+
+
+def sanitize_query(query):
+    return {
+        key: [MASK] * len(values) if key in SENSITIVE else values
+        for key, values in query.lists()
+    }
+
+
+def body_shape(request):
+    length = int(request.META.get('CONTENT_LENGTH') or 0)
+    if not length:
+        return None
+    summary = {'content_type': request.content_type, 'length': length}
+    limit = settings.DATA_UPLOAD_MAX_MEMORY_SIZE
+    # Большие тела и загрузки файлов не читаем целиком в память.
+    if request.content_type != 'application/json' or (
+        limit is not None and length > limit
+    ):
+        return summary
+    try:
+        return shape(json.loads(request.body))
+    except ValueError:
+        return summary
+
+
+class TrafficRecordingMiddleware:
+    def __init__(self, get_response):
+        if not settings.TRAFFIC_RECORDING_PATH:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.path.startswith(SKIP_PREFIXES) or (
+            random.random() >= settings.TRAFFIC_RECORDING_SAMPLE_RATE
+        ):
+            return self.get_response(request)
+        # Тело нужно прочитать до вьюхи: после разбора потока оно недоступно.
+        body = body_shape(request)
+        started = time.time()
+        response = self.get_response(request)
+        user = getattr(request, 'user', None)
+        record = {
+            'ts': started,
+            'method': request.method,
+            'path': request.path,
+            'query': sanitize_query(request.GET),
+            'body': body,
+            'user': user.pk if user and user.is_authenticated else None,
+            'status': response.status_code,
+            'duration': time.time() - started,
+        }
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        with _lock, open(
+            settings.TRAFFIC_RECORDING_PATH, 'a', encoding='utf-8'
+        ) as file:
+            file.write(line)
+        return response
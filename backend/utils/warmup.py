@@ -0,0 +1,64 @@
+"""Подготовка процесса к первым запросам.
+
+``load_modules`` выполняется в мастер-процессе gunicorn до fork: модули
+вьюх и сериализаторов импортируются один раз, и их страницы памяти
+остаются общими для воркеров. ``warm_up`` выполняется в каждом воркере:
+заполняет кэш тегов и небольшой индекс поиска ингредиентов и открывает
+соединения со всеми БД в каждом потоке-обработчике, где они живут
+``CONN_MAX_AGE`` секунд. Индекс подбора по продуктам размером с каталог
+строится при первом запросе к нему, а не при каждом перезапуске воркера.
+"""
+import threading
+import time
+
+from django.db import connection, connections
+from django.urls import get_resolver
+
+from utils.constants import WARMUP_THREAD_TIMEOUT
+
+
+def load_modules():
+    # Заполнение reverse_dict импортирует весь URLconf вместе с вьюхами.
+    get_resolver().reverse_dict
+
+
+def open_connections():
+    for alias in connections:
+        connections[alias].ensure_connection()
+
+
+def open_thread_connections(pool, threads):
+    """Открывает соединения с БД в каждом из ``threads`` потоков пула."""
+    barrier = threading.Barrier(threads, timeout=WARMUP_THREAD_TIMEOUT)
+
+    def connect():
+        # Задача ждёт, пока не запустятся все: так пул создаёт для каждой
+        # свой поток, и соединение остаётся в этом потоке.
+        barrier.wait()
+        open_connections()
+
+    for future in [pool.submit(connect) for _ in range(threads)]:
+        future.result()
+
+
+def warm_up(pool=None, threads=0):
+    """Возвращает время подготовки воркера в секундах.
+
+    Без пула потоков-обработчиков соединения открываются в текущем
+    потоке.
+    """
+    from recipes import search
+    from recipes.cache import get_tag_ids_by_slug
+
+    started = time.monotonic()
+    load_modules()
+    get_tag_ids_by_slug()
+    if connection.vendor != 'postgresql':
+        search.get_index()
+    if pool is None:
+        open_connections()
+    else:
+        # Запросы обслуживают потоки пула, соединения этого не нужны.
+        connections.close_all()
+        open_thread_connections(pool, threads)
+    return time.monotonic() - started
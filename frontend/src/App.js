@@ -168,6 +168,7 @@ function App() {
       .getRecipes({
         page: 1,
         is_in_shopping_cart: Number(true),
+        fields: ["id"],
       })
       .then((res) => {
         const { count } = res;
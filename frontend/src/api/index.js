@@ -132,6 +132,8 @@ class Api {
     is_in_shopping_cart = 0,
     author,
     tags,
+    fields,
+    omit,
   } = {}) {
     const token = localStorage.getItem("token");
     const authorization = token ? { authorization: `Token ${token}` } : {};
@@ -146,7 +148,9 @@ class Api {
         author ? `&author=${author}` : ""
       }${is_favorited ? `&is_favorited=${is_favorited}` : ""}${
         is_in_shopping_cart ? `&is_in_shopping_cart=${is_in_shopping_cart}` : ""
-      }${tagsString}`,
+      }${tagsString}${fields ? `&fields=${fields.join(",")}` : ""}${
+        omit ? `&omit=${omit.join(",")}` : ""
+      }`,
       {
         method: "GET",
         headers: {
@@ -22,7 +22,7 @@ const HomePage = ({ updateOrders }) => {
 
   const getRecipes = ({ page = 1, tags }) => {
     api
-      .getRecipes({ page, tags })
+      .getRecipes({ page, tags, omit: ["ingredients", "text"] })
       .then(res => {
         const { results, count } = res
         setRecipes(results)
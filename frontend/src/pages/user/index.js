@@ -41,11 +41,13 @@ const UserPage = ({ updateOrders }) => {
   const authContext = useContext(AuthContext);
 
   const getRecipes = ({ page = 1, tags }) => {
-    api.getRecipes({ page, author: id, tags }).then((res) => {
-      const { results, count } = res;
-      setRecipes(results);
-      setRecipesCount(count);
-    });
+    api
+      .getRecipes({ page, author: id, tags, omit: ["ingredients", "text"] })
+      .then((res) => {
+        const { results, count } = res;
+        setRecipes(results);
+        setRecipesCount(count);
+      });
   };
 
   const getUser = () => {